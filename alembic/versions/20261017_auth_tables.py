@@ -0,0 +1,118 @@
+"""create auth tables
+
+Revision ID: 20261017_auth_tables
+Revises: 20261017_binary_uuid
+Create Date: 2026-10-17 00:00:01.000000
+
+Until now users, sessions, auth_audit and password_resets were only created
+by ``Base.metadata.create_all`` at app startup, which is now off by default.
+This creates whichever of them are missing, then adds any lookup index the
+models declare that an older create_all-built table lacks (create_all never
+alters existing tables). The retention indexes follow in 20261017_retention_ix.
+
+Downgrade drops nothing: on upgraded deployments the tables hold data that
+predates this revision.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_auth_tables"
+down_revision: Union[str, None] = "20261017_binary_uuid"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID = mysql.BINARY(16)
+NOW = sa.text("CURRENT_TIMESTAMP")
+
+# table -> [(index name, columns)]
+INDEXES: dict[str, list[tuple[str, list[str]]]] = {
+    "password_resets": [("ix_password_resets_email_lower", ["email_lower"])],
+}
+
+
+def _create_tables(inspector) -> None:
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", UUID, nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("password_hash", sa.String(length=255), nullable=False),
+            sa.Column("name", sa.String(length=120), nullable=True),
+            sa.Column("email_verified", sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column("tz", sa.String(length=64), nullable=False, server_default="Asia/Seoul"),
+            sa.Column("locale", sa.String(length=16), nullable=False, server_default="ko-KR"),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=NOW),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=NOW),
+            sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("email", name="email"),
+        )
+    if not inspector.has_table("sessions"):
+        op.create_table(
+            "sessions",
+            sa.Column("id", UUID, nullable=False),
+            sa.Column("user_id", UUID, nullable=False),
+            sa.Column("jti", UUID, nullable=False),
+            sa.Column("family_id", UUID, nullable=False),
+            sa.Column("user_agent", sa.String(length=512), nullable=True),
+            sa.Column("ip_hash", sa.String(length=128), nullable=True),
+            sa.Column("idx", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("last_rotated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=NOW),
+            sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("jti", name="jti"),
+            sa.ForeignKeyConstraint(
+                ["user_id"], ["users.id"], name="fk_sessions_user_id_users", ondelete="CASCADE"
+            ),
+        )
+    if not inspector.has_table("auth_audit"):
+        op.create_table(
+            "auth_audit",
+            sa.Column("id", UUID, nullable=False),
+            sa.Column("user_id", UUID, nullable=True),
+            sa.Column("event", sa.String(length=64), nullable=False),
+            sa.Column("ip", sa.String(length=64), nullable=True),
+            sa.Column("ua", sa.String(length=512), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=NOW),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    if not inspector.has_table("password_resets"):
+        op.create_table(
+            "password_resets",
+            sa.Column("id", UUID, nullable=False),
+            sa.Column("email_lower", sa.String(length=255), nullable=False),
+            sa.Column("otp_hash", sa.String(length=255), nullable=False),
+            sa.Column("otp_expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("consumed_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=NOW),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+
+def _missing_indexes(inspector) -> list[tuple[str, str, list[str]]]:
+    missing = []
+    for table, indexes in INDEXES.items():
+        existing = {tuple(ix["column_names"]) for ix in inspector.get_indexes(table)}
+        for name, columns in indexes:
+            if tuple(columns) not in existing:
+                missing.append((table, name, columns))
+    return missing
+
+
+def upgrade() -> None:
+    _create_tables(sa.inspect(op.get_bind()))
+    for table, name, columns in _missing_indexes(sa.inspect(op.get_bind())):
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,144 @@
+"""store uuid keys as binary(16)
+
+Revision ID: 20261017_binary_uuid
+Revises: 20240602_add_quotes
+Create Date: 2026-10-17 00:00:00.000000
+
+Converts CHAR(36) UUID columns to BINARY(16) without one long table copy:
+
+1. add nullable ``<col>_new`` shadow columns (an instant ALTER on MySQL 8),
+2. backfill them with UUID_TO_BIN in small autocommitted primary-key ranges,
+3. catch up rows written meanwhile, then swap the columns and rebuild the
+   keys in one ALTER per table.
+
+Step 3 is the only part that blocks writers for long. Stop the app's
+writers (or accept that rows written during the ALTER fail) for that step.
+Existing uuid4 values keep their bytes; new rows get time-ordered UUIDv7 ids.
+"""
+
+import time
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_binary_uuid"
+down_revision: Union[str, None] = "20240602_add_quotes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+BATCH_SLEEP_S = 0.05
+
+# table -> (pk column, uuid columns, nullable uuid columns)
+TABLES: dict[str, tuple[str, list[str], set[str]]] = {
+    "users": ("id", ["id"], set()),
+    "sessions": ("id", ["id", "user_id", "jti", "family_id"], set()),
+    "auth_audit": ("id", ["id", "user_id"], {"user_id"}),
+    "password_resets": ("id", ["id"], set()),
+}
+SESSIONS_USER_FK = "fk_sessions_user_id_users"
+
+
+def _uuid_columns(inspector, table: str, wanted_type: str) -> list[str]:
+    if not inspector.has_table(table):
+        return []
+    _, columns, _ = TABLES[table]
+    types = {col["name"]: str(col["type"]).upper() for col in inspector.get_columns(table)}
+    return [col for col in columns if types.get(col, "").startswith(wanted_type)]
+
+
+def _convert(table: str, from_type: str, to_type: str, expr: str) -> None:
+    """Copy the UUID columns of ``table`` into ``to_type`` shadow columns in batches, then swap them in."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = _uuid_columns(inspector, table, from_type)
+    if not columns:
+        return
+    pk, _, nullable = TABLES[table]
+    primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+    unique_keys = [uc for uc in inspector.get_unique_constraints(table) if set(uc["column_names"]) & set(columns)]
+    indexes = [
+        ix
+        for ix in inspector.get_indexes(table)
+        if not ix.get("unique") and set(ix["column_names"]) & set(columns)
+    ]
+
+    op.execute(f"ALTER TABLE {table} " + ", ".join(f"ADD COLUMN {col}_new {to_type} NULL" for col in columns))
+
+    assignments = ", ".join(f"{col}_new = {expr.format(col=col)}" for col in columns)
+    with op.get_context().autocommit_block():
+        # Walk the primary key in ranges so each batch is an index range scan,
+        # not a rescan of everything already backfilled.
+        last = None
+        while True:
+            after = "" if last is None else f"WHERE {pk} > :last"
+            upper = bind.execute(
+                sa.text(f"SELECT {pk} FROM {table} {after} ORDER BY {pk} LIMIT 1 OFFSET {BATCH_SIZE - 1}"),
+                {"last": last},
+            ).scalar()
+            bounds = [] if last is None else [f"{pk} > :last"]
+            if upper is not None:
+                bounds.append(f"{pk} <= :upper")
+            where = f" WHERE {' AND '.join(bounds)}" if bounds else ""
+            bind.execute(sa.text(f"UPDATE {table} SET {assignments}{where}"), {"last": last, "upper": upper})
+            if upper is None:
+                break
+            last = upper
+            time.sleep(BATCH_SLEEP_S)
+
+    # Catch up rows inserted during the backfill (random uuid4 keys land
+    # behind the walk too), then swap in one rebuild.
+    op.execute(f"UPDATE {table} SET {assignments} WHERE {pk}_new IS NULL")
+    alters = []
+    if primary_key:
+        alters.append("DROP PRIMARY KEY")
+    for uc in unique_keys:
+        alters.append(f"DROP INDEX {uc['name']}")
+    for ix in indexes:
+        alters.append(f"DROP INDEX {ix['name']}")
+    for col in columns:
+        null = "NULL" if col in nullable else "NOT NULL"
+        alters.append(f"DROP COLUMN {col}")
+        alters.append(f"CHANGE COLUMN {col}_new {col} {to_type} {null}")
+    if primary_key:
+        alters.append(f"ADD PRIMARY KEY ({', '.join(primary_key)})")
+    for uc in unique_keys:
+        alters.append(f"ADD UNIQUE INDEX {uc['name']} ({', '.join(uc['column_names'])})")
+    for ix in indexes:
+        alters.append(f"ADD INDEX {ix['name']} ({', '.join(ix['column_names'])})")
+    op.execute(f"ALTER TABLE {table} " + ", ".join(alters))
+
+
+def _drop_sessions_fk() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("sessions"):
+        return
+    for fk in inspector.get_foreign_keys("sessions"):
+        if fk["referred_table"] == "users":
+            op.drop_constraint(fk["name"], "sessions", type_="foreignkey")
+
+
+def _add_sessions_fk() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("sessions") or not inspector.has_table("users"):
+        return
+    if any(fk["referred_table"] == "users" for fk in inspector.get_foreign_keys("sessions")):
+        return
+    op.create_foreign_key(SESSIONS_USER_FK, "sessions", "users", ["user_id"], ["id"], ondelete="CASCADE")
+
+
+def upgrade() -> None:
+    _drop_sessions_fk()
+    for table in TABLES:
+        _convert(table, "CHAR", "BINARY(16)", "UUID_TO_BIN({col})")
+    _add_sessions_fk()
+
+
+def downgrade() -> None:
+    _drop_sessions_fk()
+    for table in TABLES:
+        _convert(table, "BINARY", "CHAR(36)", "BIN_TO_UUID({col})")
+    _add_sessions_fk()
@@ -0,0 +1,50 @@
+"""index session and audit timestamps for retention
+
+Revision ID: 20261017_retention_ix
+Revises: 20261017_auth_tables
+Create Date: 2026-10-17 00:00:02.000000
+
+The retention sweeper deletes sessions by expires_at and revoked_at and audit
+rows by created_at; without these indexes every batch scans the table. Tables
+built by create_all after the models gained the indexes already have them, so
+only missing ones are created.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "20261017_retention_ix"
+down_revision: Union[str, None] = "20261017_auth_tables"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> [(index name, columns)]
+INDEXES: dict[str, list[tuple[str, list[str]]]] = {
+    "sessions": [
+        ("ix_sessions_expires_at", ["expires_at"]),
+        ("ix_sessions_revoked_at", ["revoked_at"]),
+    ],
+    "auth_audit": [("ix_auth_audit_created_at", ["created_at"])],
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, indexes in INDEXES.items():
+        existing = {tuple(ix["column_names"]) for ix in inspector.get_indexes(table)}
+        for name, columns in indexes:
+            if tuple(columns) not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, indexes in INDEXES.items():
+        names = {ix["name"] for ix in inspector.get_indexes(table)}
+        for name, _ in indexes:
+            if name in names:
+                op.drop_index(name, table_name=table)
@@ -0,0 +1,46 @@
+import jwt
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_db
+from app.core.redis import get_redis
+from app.schemas.auth import UserPublic
+from app.services import users as user_service
+from app.services.tokens import AccessClaims, decode_access
+
+UNAUTHENTICATED = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Not authenticated",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+def _access_token(request: Request) -> str | None:
+    authorization = request.headers.get("authorization")
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            return token.strip()
+    return request.cookies.get("access_token")
+
+
+async def get_current_claims(request: Request) -> AccessClaims:
+    """Verify the access token from the Bearer header or ``access_token`` cookie, without I/O."""
+    token = _access_token(request)
+    if not token:
+        raise UNAUTHENTICATED
+    try:
+        return decode_access(token)
+    except jwt.PyJWTError:
+        raise UNAUTHENTICATED
+
+
+async def get_current_user(
+    claims: AccessClaims = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_db),
+    redis=Depends(get_redis),
+) -> UserPublic:
+    user = await user_service.get_profile(db, redis, claims.sub)
+    if user is None:
+        raise UNAUTHENTICATED
+    return user
@@ -0,0 +1,52 @@
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import get_db
+from app.services import provisioning
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+
+async def require_admin(request: Request) -> None:
+    token = request.headers.get(ADMIN_TOKEN_HEADER)
+    if (
+        not settings.admin_token
+        or not token
+        or not hmac.compare_digest(token.encode(), settings.admin_token.encode())
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+def _format(request: Request, requested: str | None) -> str:
+    if requested:
+        return requested
+    content_type = request.headers.get("content-type", "")
+    return provisioning.FORMAT_CSV if "csv" in content_type else provisioning.FORMAT_JSONL
+
+
+@router.post("/users/bulk", dependencies=[Depends(require_admin)])
+async def bulk_provision(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|jsonl)$"),
+    chunk_size: int | None = Query(None, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create users from a CSV or JSONL body; streams one JSON result per input row."""
+    parse = provisioning.PARSERS[_format(request, format)]
+    upload = await provisioning.spool(request.stream(), settings.provisioning.spool_memory_bytes)
+    rows = parse(provisioning.iter_lines(provisioning.iter_file(upload)))
+
+    async def results():
+        try:
+            async for result in provisioning.provision(db, rows, chunk_size=chunk_size):
+                yield result.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            upload.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
@@ -5,10 +6,12 @@ from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.deps import get_current_claims, get_current_user
 from app.core.config import settings
-from app.core.db import get_db
+from app.core.db import PRIMARY, get_db
 from app.core.redis import get_redis
 from app.models.session import Session
+from app.models.types import uuid7_str
 from app.models.user import User
 from app.schemas.auth import (
     AuthEnvelope,
@@ -20,7 +23,10 @@ from app.schemas.auth import (
     UserPublic,
 )
 from app.services import audit, otp, password as password_service, risk, session as session_service
-from app.services.tokens import decode_refresh, issue_access, issue_refresh
+from app.services import users as user_service
+from app.services.ratelimit import body_field, headers_for, rate_limit, too_many_requests
+from app.services.tokens import AccessClaims, decode_refresh, issue_access, issue_refresh
+from app.utils.request import client_ip
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -67,27 +73,11 @@ def _clear_auth_cookies(resp: Response) -> None:
     resp.delete_cookie(settings.csrf_cookie_name, domain=settings.cookie_domain)
 
 
-def _public_user(user: User) -> UserPublic:
-    return UserPublic(
-        id=user.id,
-        email=user.email,
-        name=user.name,
-        tz=user.tz,
-        locale=user.locale,
-        emailVerified=user.email_verified,
-    )
-
-
-def _client_ip(request: Request) -> str | None:
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    if request.client:
-        return request.client.host
-    return None
-
-
-@router.post("/signup", response_model=AuthEnvelope)
+@router.post(
+    "/signup",
+    response_model=AuthEnvelope,
+    dependencies=[Depends(rate_limit("signup", per_ip=settings.rate_limit.signup_ip))],
+)
 async def signup(
     req: SignUpIn,
     request: Request,
@@ -98,14 +88,14 @@ async def signup(
 ):
     if await risk.is_locked(redis, req.email):
         raise GENERIC
-    user = User(email=req.email, password_hash=password_service.hash_password(req.password), name=req.name)
+    user = User(email=req.email, password_hash=await password_service.hash_password_async(req.password), name=req.name)
     try:
         async with db.begin():
             db.add(user)
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unable to complete request")
 
-    family_id = str(uuid.uuid4())
+    family_id = uuid7_str()
     refresh, jti, idx, _ = issue_refresh(user.id, family_id, 0)
     async with db.begin():
         await session_service.create_session(
@@ -116,24 +106,24 @@ async def signup(
             idx=idx,
             refresh_ttl_days=settings.refresh_token_days,
             user_agent=request.headers.get("user-agent"),
-            ip=_client_ip(request),
+            ip=client_ip(request),
             # user_agent=request.headers.get("user-agent") if request else None,
-            # ip=_client_ip(request) if request else None,
+            # ip=client_ip(request) if request else None,
         )
         await audit.record_event(
             db,
             user_id=user.id,
             event="signup",
-            ip=_client_ip(request),
+            ip=client_ip(request),
             user_agent=request.headers.get("user-agent"),
-            # ip=_client_ip(request) if request else None,
+            # ip=client_ip(request) if request else None,
             # user_agent=request.headers.get("user-agent") if request else None,
         )
 
     access = issue_access(user.id, jti)
     _set_auth_cookies(resp, access, refresh)
 
-    return AuthEnvelope(data=_public_user(user))
+    return AuthEnvelope(data=user_service.to_public(user))
 
 
 @router.post("/signin", response_model=AuthEnvelope)
@@ -144,22 +134,31 @@ async def signin(
     db: AsyncSession = Depends(get_db),
     redis=Depends(get_redis),
 ):
-    ip = _client_ip(request)
-    if await risk.is_locked(redis, req.email):
+    ip = client_ip(request)
+    verdict = await risk.check_signin(redis, req.email, ip)
+    if verdict.status == risk.VERDICT_LOCKED:
         raise GENERIC
+    if verdict.status == risk.VERDICT_RATE_LIMITED:
+        raise too_many_requests(verdict.retry_after_ms, verdict.remaining, verdict.reset_ms, verdict.limit)
+    resp.headers.update(headers_for(verdict.remaining, verdict.reset_ms, verdict.limit))
 
-    ip_count, email_count = await risk.hit_signin(redis, req.email, ip)
-    if risk.is_rate_limited(ip_count, email_count):
-        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Slow down")
-
-    user: User | None
+    credentials = select(User.id, User.password_hash).where(User.email == req.email)
     async with db.begin():
-        result = await db.execute(select(User).where(User.email == req.email))
-        user = result.scalar_one_or_none()
-    if not user or not password_service.verify_password(user.password_hash, req.password):
-        await risk.after_fail(redis, req.email)
+        user = (await db.execute(credentials)).one_or_none()
+    valid = user is not None and await password_service.verify_password_async(user.password_hash, req.password)
+    if not valid and settings.database_replica_urls:
+        # The replica may not have caught up with a sign-up or password reset yet; only a changed row is re-verified.
+        async with db.begin():
+            latest = (await db.execute(credentials, bind_arguments=PRIMARY)).one_or_none()
+        if latest != user:
+            user = latest
+            valid = user is not None and await password_service.verify_password_async(
+                user.password_hash, req.password
+            )
+    if not valid:
+        _, captcha = await risk.record_signin_failure(redis, req.email)
         headers: dict[str, str] | None = None
-        if await risk.captcha_hint(redis, req.email):
+        if captcha:
             headers = {"X-Captcha-Hint": "true"}
         async with db.begin():
             await audit.record_event(
@@ -174,8 +173,11 @@ async def signin(
         )
 
     await risk.reset_fail(redis, req.email)
+    profile = await user_service.get_profile(db, redis, user.id)
+    if profile is None:
+        raise GENERIC
 
-    family_id = str(uuid.uuid4())
+    family_id = uuid7_str()
     refresh, jti, idx, _ = issue_refresh(user.id, family_id, 0)
     async with db.begin():
         await session_service.create_session(
@@ -199,7 +201,7 @@ async def signin(
     access = issue_access(user.id, jti)
     _set_auth_cookies(resp, access, refresh)
 
-    return AuthEnvelope(data=_public_user(user))
+    return AuthEnvelope(data=profile)
 
 
 @router.post("/signout", status_code=204)
@@ -218,7 +220,7 @@ async def signout(
         if payload:
             session: Session | None
             async with db.begin():
-                session = await session_service.get_session_by_jti(db, payload["jti"])
+                session = await session_service.lock_session(db, payload["jti"])
                 if session:
                     await session_service.mark_revoked(db, session)
             if session:
@@ -228,6 +230,33 @@ async def signout(
     return resp
 
 
+@router.post("/signout/all", status_code=204)
+async def signout_all(
+    resp: Response,
+    request: Request,
+    claims: AccessClaims = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_db),
+    redis=Depends(get_redis),
+):
+    await session_service.revoke_all_for_user(db, redis, claims.sub, settings.refresh_token_days)
+    async with db.begin():
+        await audit.record_event(
+            db,
+            user_id=claims.sub,
+            event="signout.all",
+            ip=client_ip(request),
+            user_agent=request.headers.get("user-agent"),
+        )
+    _clear_auth_cookies(resp)
+    resp.status_code = 204
+    return resp
+
+
+@router.get("/me", response_model=AuthEnvelope)
+async def me(user: UserPublic = Depends(get_current_user)):
+    return AuthEnvelope(data=user)
+
+
 @router.post("/refresh", response_model=AuthEnvelope)
 async def refresh(
     request: Request,
@@ -243,62 +272,82 @@ async def refresh(
     except Exception:
         raise GENERIC
 
-    session: Session | None
-    async with db.begin():
-        session = await session_service.get_session_by_jti(db, payload["jti"])
-    if not session or session.family_id != payload.get("fam"):
-        if session:
-            async with db.begin():
-                await session_service.mark_revoked(db, session)
-        await session_service.revoke_family(redis, payload.get("fam", str(uuid.uuid4())), settings.refresh_token_days)
+    family_id = payload.get("fam")
+    family_revoked = None
+    reuse_detected = rotated = False
+    try:
+        # The revocation lookup runs while the session row is being read and locked.
+        if family_id:
+            family_revoked = asyncio.create_task(risk.is_family_revoked(redis, family_id))
+        async with db.begin():
+            session = await session_service.lock_session(db, payload["jti"])
+            revoked = family_revoked is not None and await family_revoked
+            if not session or session.family_id != family_id or session.idx != payload.get("idx"):
+                reuse_detected = True
+                if session and not session.revoked_at:
+                    await session_service.mark_revoked(db, session)
+            elif (
+                not session.revoked_at
+                and not revoked
+                # Checked under the lock so a user deleted mid-refresh never gets a new token.
+                and await user_service.is_active(db, session.user_id)
+            ):
+                new_idx = session.idx + 1
+                new_refresh, new_jti, _, _ = issue_refresh(session.user_id, session.family_id, new_idx)
+                await session_service.rotate_session(
+                    db,
+                    session=session,
+                    new_jti=new_jti,
+                    new_idx=new_idx,
+                    refresh_ttl_days=settings.refresh_token_days,
+                )
+                await audit.record_event(
+                    db,
+                    user_id=session.user_id,
+                    event="refresh",
+                    ip=client_ip(request),
+                    user_agent=request.headers.get("user-agent"),
+                )
+                rotated = True
+    finally:
+        if family_revoked is not None and not family_revoked.done():
+            family_revoked.cancel()
+
+    if reuse_detected:
+        await session_service.revoke_family(redis, family_id or str(uuid.uuid4()), settings.refresh_token_days)
         raise GENERIC
-
-    if session.revoked_at or await risk.is_family_revoked(redis, session.family_id):
+    if not rotated:
         raise GENERIC
 
-    if session.idx != payload.get("idx"):
-        await session_service.revoke_family(redis, session.family_id, settings.refresh_token_days)
-        if not session.revoked_at:
-            async with db.begin():
-                await session_service.mark_revoked(db, session)
+    profile = await user_service.get_profile(db, redis, session.user_id)
+    if profile is None:
         raise GENERIC
-
-    user: User
-    new_jti: str
-    new_refresh: str
-    async with db.begin():
-        user = await db.get(User, session.user_id)
-        if not user:
-            raise GENERIC
-        new_idx = session.idx + 1
-        new_refresh, new_jti, _, _ = issue_refresh(user.id, session.family_id, new_idx)
-        await session_service.rotate_session(
-            db,
-            session=session,
-            new_jti=new_jti,
-            new_idx=new_idx,
-            refresh_ttl_days=settings.refresh_token_days,
-        )
-        await audit.record_event(
-            db,
-            user_id=user.id,
-            event="refresh",
-            ip=_client_ip(request),
-            user_agent=request.headers.get("user-agent"),
-        )
-
-    access = issue_access(user.id, new_jti)
+    access = issue_access(session.user_id, new_jti)
     _set_auth_cookies(resp, access, new_refresh)
-    return AuthEnvelope(data=_public_user(user))
-
-
-@router.post("/otp/start", status_code=204)
-async def otp_start(req: OtpStartIn, redis=Depends(get_redis)):
+    return AuthEnvelope(data=profile)
+
+
+@router.post(
+    "/otp/start",
+    status_code=204,
+    dependencies=[
+        Depends(
+            rate_limit(
+                "otp_start",
+                per_ip=settings.rate_limit.otp_start_ip,
+                per_key=settings.rate_limit.otp_start_email,
+                key=body_field("email"),
+            )
+        )
+    ],
+)
+async def otp_start(req: OtpStartIn, resp: Response, redis=Depends(get_redis)):
     try:
         await otp.start(redis, req.email)
     except Exception:
         pass
-    return Response(status_code=204)
+    resp.status_code = 204
+    return resp
 
 
 @router.post("/otp/verify", status_code=204)
@@ -345,22 +394,18 @@ async def password_reset(
     if not user:
         return resp
 
+    new_hash = await password_service.hash_password_async(req.new_password)
     async with db.begin():
-        user.password_hash = password_service.hash_password(req.new_password)
+        user.password_hash = new_hash
         await audit.record_event(
             db,
             user_id=user.id,
             event="reset.finish",
-            ip=_client_ip(request),
+            ip=client_ip(request),
             user_agent=request.headers.get("user-agent"),
         )
         await db.flush()
-    sessions: list[Session]
-    async with db.begin():
-        sessions = (await db.execute(select(Session).where(Session.user_id == user.id))).scalars().all()
-    async with db.begin():
-        for sess in sessions:
-            await session_service.mark_revoked(db, sess)
-            await session_service.revoke_family(redis, sess.family_id, settings.refresh_token_days)
+    await user_service.invalidate_profile(redis, user.id)
+    await session_service.revoke_all_for_user(db, redis, user.id, settings.refresh_token_days)
 
     return resp
@@ -1,26 +1,35 @@
+import json
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.db import get_db
 from app.schemas.motivation import MotivationOut, QuoteOut
-from app.services.motivation import generate_hourly_motivation
+from app.services.motivation import motivation_for_quote, stream_motivation_for_quote
 from app.services.quotes import get_quote_for_current_hour
+from app.services.ratelimit import rate_limit
 
 router = APIRouter(prefix="/motivation", tags=["motivation"])
 
 
-@router.get("/now", response_model=MotivationOut)
+@router.get(
+    "/now",
+    response_model=MotivationOut,
+    dependencies=[Depends(rate_limit("motivation", per_ip=settings.rate_limit.motivation_ip))],
+)
 async def get_current_motivation(
     name: str = "Friend",
     locale: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ) -> MotivationOut:
     now = datetime.now(timezone.utc)
-    message = await generate_hourly_motivation(db, user_name=name, locale=locale, now=now)
     quote = await get_quote_for_current_hour(db, now=now, locale=locale)
+    message = await motivation_for_quote(quote, user_name=name, locale=locale, now=now)
 
     return MotivationOut(
         message=message,
@@ -32,3 +41,53 @@ async def get_current_motivation(
         if quote
         else None,
     )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get(
+    "/stream",
+    dependencies=[Depends(rate_limit("motivation", per_ip=settings.rate_limit.motivation_ip))],
+)
+async def stream_current_motivation(
+    name: str = "Friend",
+    locale: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """Server-Sent Events: one ``quote`` event, ``token`` events, then ``done`` with timings."""
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    quote = await get_quote_for_current_hour(db, now=now, locale=locale)
+
+    async def events():
+        quote_out = QuoteOut(text=quote.text, author=quote.author, locale=quote.locale) if quote else None
+        yield _sse("quote", {"quote": quote_out.model_dump() if quote_out else None})
+
+        first_token_ms = None
+        cached = fallback = False
+        try:
+            async for chunk in stream_motivation_for_quote(quote, user_name=name, locale=locale, now=now):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                cached, fallback = chunk.cached, chunk.fallback
+                yield _sse("token", {"text": chunk.text})
+        except Exception:
+            yield _sse("error", {"detail": "Generation interrupted"})
+
+        yield _sse(
+            "done",
+            {
+                "cached": cached,
+                "fallback": fallback,
+                "first_token_ms": first_token_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
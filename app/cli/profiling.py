@@ -0,0 +1,19 @@
+"""Profiling helpers.
+
+    python -m app.cli.profiling token            # X-Profile-Token value valid for 10 minutes
+    python -m app.cli.profiling token --ttl 60
+
+    curl -H "X-Profile-Token: $(python -m app.cli.profiling token)" ...
+"""
+
+import argparse
+import time
+
+from app.utils.profiling import sign_profile_token
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profiling helpers")
+    parser.add_argument("command", choices=["token"])
+    parser.add_argument("--ttl", type=int, default=600, help="seconds the token stays valid")
+    args = parser.parse_args()
+    print(sign_profile_token(int(time.time()) + args.ttl))
@@ -0,0 +1,51 @@
+"""Bulk user provisioning.
+
+    python -m app.cli.provision users.csv                 # format from the extension
+    python -m app.cli.provision users.jsonl --chunk-size 1000
+    cat users.csv | python -m app.cli.provision - --format csv
+
+Columns / keys: email (required), password, name, tz, locale, email_verified.
+One JSON result per input row is written to stdout and a summary to stderr.
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+from app.core.db import AsyncSessionLocal, dispose_engine
+from app.services import password as password_service
+from app.services import provisioning
+
+
+async def _lines(stream):
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+async def main(path: str, fmt: str, chunk_size: int | None) -> None:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+    counts: Counter[str] = Counter()
+    try:
+        rows = provisioning.PARSERS[fmt](_lines(stream))
+        async with AsyncSessionLocal() as db:
+            async for result in provisioning.provision(db, rows, chunk_size=chunk_size):
+                counts[result.status] += 1
+                print(result.model_dump_json(exclude_none=True))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        sys.stdout.flush()
+        password_service.shutdown_pool()
+        await dispose_engine()
+    print(dict(counts), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create users in bulk from CSV or JSONL")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=sorted(provisioning.PARSERS), help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, help="rows per lookup/insert batch")
+    args = parser.parse_args()
+    fmt = args.format or (provisioning.FORMAT_CSV if args.path.endswith(".csv") else provisioning.FORMAT_JSONL)
+    asyncio.run(main(args.path, fmt, args.chunk_size))
@@ -0,0 +1,29 @@
+"""Retention maintenance.
+
+    python -m app.cli.retention sweep               # one sweep of every policy
+    python -m app.cli.retention partition-audit     # one-off: convert auth_audit to monthly partitions
+    python -m app.cli.retention ensure-partitions   # create upcoming monthly partitions
+"""
+
+import argparse
+import asyncio
+
+from app.core.db import AsyncSessionLocal, dispose_engine
+from app.services import retention
+
+
+async def main(command: str) -> None:
+    async with AsyncSessionLocal() as db:
+        if command == "sweep":
+            print(await retention.sweep(db))
+        elif command == "partition-audit":
+            await retention.partition_audit_table(db)
+        elif command == "ensure-partitions":
+            await retention.ensure_audit_partitions(db)
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retention maintenance for sessions and auth_audit")
+    parser.add_argument("command", choices=["sweep", "partition-audit", "ensure-partitions"])
+    asyncio.run(main(parser.parse_args().command))
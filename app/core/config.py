@@ -1,7 +1,14 @@
 from functools import lru_cache
+from typing import Literal
+
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
+class RateLimitRule(BaseModel):
+    limit: int = Field(..., description="Requests allowed per period (also the burst size)")
+    period_s: int = Field(..., description="Period over which the limit applies")
+
+
 class RateLimitSettings(BaseModel):
     signin_ip_window_s: int = Field(60, description="Time window for per-IP sign-in attempts")
     signin_ip_max: int = Field(10, description="Max attempts per IP within the window")
@@ -9,6 +16,115 @@ class RateLimitSettings(BaseModel):
     signin_email_max: int = Field(10, description="Max attempts per email within the window")
     lock_minutes: int = Field(10, description="Lock duration once threshold exceeded")
     captcha_hint_after: int = Field(5, description="Attempt count to hint CAPTCHA requirement")
+    signup_ip: RateLimitRule = Field(
+        RateLimitRule(limit=10, period_s=3600), description="Sign-ups allowed per IP"
+    )
+    otp_start_ip: RateLimitRule = Field(
+        RateLimitRule(limit=10, period_s=600), description="OTP emails requested per IP"
+    )
+    otp_start_email: RateLimitRule = Field(
+        RateLimitRule(limit=3, period_s=600), description="OTP emails requested per address"
+    )
+    motivation_ip: RateLimitRule = Field(
+        RateLimitRule(limit=60, period_s=60), description="Motivation requests per IP"
+    )
+
+
+class PasswordHashSettings(BaseModel):
+    workers: int | None = Field(None, description="Process pool size for Argon2 work (defaults to CPU count)")
+    max_queue: int = Field(64, description="Max hash/verify jobs waiting for a free worker")
+    retry_after_s: int = Field(1, description="Retry-After hint sent when the pool is saturated")
+
+
+class MotivationSettings(BaseModel):
+    cache_enabled: bool = Field(True, description="Share generated messages across workers through Redis")
+    lock_timeout_s: int = Field(15, description="How long one worker may hold the generation lock for a key")
+    lock_poll_ms: int = Field(50, description="Poll interval while another worker generates the same key")
+    pregen_enabled: bool = Field(True, description="Pre-generate name-templated messages for each locale every hour")
+    pregen_lead_s: int = Field(120, description="How long before the hour boundary the next hour is pre-generated")
+    pregen_concurrency: int = Field(4, description="Max concurrent model calls during a pre-generation batch")
+    budget_s: float = Field(3.0, description="Per-request wait for a generated message before the fallback is served")
+    llm_timeout_s: float = Field(10.0, description="Hard cap on a single model call, including client retries")
+    llm_max_retries: int = Field(1, description="Retries the OpenAI client makes on transient errors")
+    breaker_failures: int = Field(5, description="Consecutive model failures that open the circuit")
+    breaker_reset_s: float = Field(30.0, description="How long the circuit stays open before a trial call")
+
+
+class AuditSettings(BaseModel):
+    async_writes: bool = Field(True, description="Write audit rows from a background batcher instead of the request")
+    batch_size: int = Field(200, description="Max rows per multi-row INSERT")
+    flush_ms: int = Field(250, description="Max time a queued row waits before its batch is written")
+    max_queue: int = Field(10000, description="Rows buffered in memory before backpressure applies")
+    backpressure: Literal["block", "drop", "sync"] = Field(
+        "sync", description="When the queue is full: wait for room, drop the row, or write it in the request"
+    )
+
+
+class MailOutboxSettings(BaseModel):
+    enabled: bool = Field(True, description="Queue mail in Redis and send it from background dispatchers")
+    workers: int = Field(1, description="Dispatcher tasks per process, each with its own SMTP connection")
+    batch_size: int = Field(20, description="Messages popped and sent per connection round")
+    poll_s: int = Field(1, description="Blocking pop timeout while the outbox is empty")
+    max_attempts: int = Field(5, description="Send attempts before a message is dropped")
+    backoff_base_s: float = Field(2.0, description="Delay before the first retry; doubles on each attempt")
+    backoff_max_s: float = Field(300.0, description="Upper bound on the retry delay")
+    smtp_timeout_s: float = Field(10.0, description="Timeout for SMTP connect and commands")
+    idle_close_s: float = Field(60.0, description="Close the SMTP connection after this long without mail")
+    lease_s: int = Field(300, description="Heartbeat lifetime; a silent dispatcher's in-flight mail is re-queued")
+    dead_max: int = Field(1000, description="Malformed outbox entries kept for inspection")
+    dead_ttl_s: int = Field(86400, description="How long the malformed-entry list outlives its last entry")
+
+
+class RetentionSettings(BaseModel):
+    enabled: bool = Field(True, description="Run the retention sweeper in the background")
+    interval_s: int = Field(3600, description="Time between sweeps")
+    batch_size: int = Field(1000, description="Rows deleted per transaction")
+    batch_sleep_ms: int = Field(200, description="Pause between delete batches")
+    expired_session_days: int = Field(1, description="Keep sessions this long past expires_at")
+    revoked_session_days: int = Field(7, description="Keep revoked sessions this long past revoked_at")
+    audit_days: int = Field(180, description="Keep auth_audit rows this long")
+    audit_partitioned: bool = Field(False, description="auth_audit uses monthly partitions; drop them instead of deleting rows")
+    audit_partition_months_ahead: int = Field(3, description="Future monthly partitions to keep created")
+
+
+class ProvisioningSettings(BaseModel):
+    chunk_size: int = Field(500, description="Rows looked up, hashed and inserted together")
+    hash_concurrency: int | None = Field(
+        None, description="Argon2 jobs in flight per import (defaults to the password pool size)"
+    )
+    spool_memory_bytes: int = Field(
+        8 * 1024 * 1024, description="Upload bytes the bulk endpoint keeps in memory before spooling to disk"
+    )
+
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(0.0, description="Fraction of requests profiled without being asked (0 disables)")
+    header_enabled: bool = Field(True, description="Profile requests carrying a valid signed X-Profile-Token header")
+    mode: Literal["sample", "cprofile"] = Field(
+        "sample", description="Stack sampler writing collapsed stacks, or cProfile writing .prof files"
+    )
+    sample_interval_ms: float = Field(2.0, description="Stack sampler period")
+    output_dir: str = Field("/tmp/profiles", description="Where profile dumps are written")
+    loop_lag_threshold_ms: int = Field(100, description="Log the loop thread's stack when it blocks this long (0 disables)")
+    loop_lag_interval_ms: int = Field(50, description="Loop-lag heartbeat period")
+
+
+class LifespanSettings(BaseModel):
+    warm_db_connections: int = Field(5, description="DB connections opened at startup, before /ready passes")
+    warm_redis_connections: int = Field(5, description="Redis connections opened at startup")
+    warm_password_pool: bool = Field(True, description="Spawn the Argon2 worker processes at startup")
+    drain_delay_s: float = Field(
+        0.0, description="After SIGTERM, keep serving with /ready failing this long so load balancers move away"
+    )
+    shutdown_timeout_s: float = Field(20.0, description="Deadline for flushing queues and closing pools on shutdown")
+
+
+class ReplicaSettings(BaseModel):
+    max_lag_s: float = Field(
+        2.0, description="Take a replica out of rotation while it lags the primary by more than this (0 disables)"
+    )
+    check_interval_s: float = Field(1.0, description="How often replica health and lag are checked")
+    check_timeout_s: float = Field(1.0, description="A replica that does not answer the check this fast is taken out")
 
 
 class Settings(BaseSettings):
@@ -16,6 +132,13 @@ class Settings(BaseSettings):
     api_version: str = "1.0.0"
 
     database_url: str = Field(..., env="DATABASE_URL")
+    database_replica_urls: list[str] = Field(
+        [], env="DATABASE_REPLICA_URLS", description="Read replicas as a JSON list; empty sends every query to the primary"
+    )
+    replicas: ReplicaSettings = ReplicaSettings()
+    db_create_all: bool = Field(
+        False, env="DB_CREATE_ALL", description="Create missing tables at startup instead of relying on migrations"
+    )
     redis_url: str = Field(..., env="REDIS_URL")
 
     jwt_secret: str = Field(..., env="JWT_SECRET")
@@ -24,6 +147,8 @@ class Settings(BaseSettings):
 
     access_token_minutes: int = 15
     refresh_token_days: int = 7
+    access_token_cache_size: int = 10000
+    user_cache_ttl_s: int = 300
 
     enforce_https: bool = True
     hsts_max_age: int = 31536000
@@ -31,14 +156,28 @@ class Settings(BaseSettings):
     csrf_cookie_name: str = "csrf_token"
     csrf_header_name: str = "x-csrf-token"
 
+    admin_token: str | None = Field(None, env="ADMIN_TOKEN")
+
     mail_sender: str = Field(..., env="MAIL_SENDER")
     mail_host: str = Field(..., env="MAIL_HOST")
     mail_port: int = Field(587, env="MAIL_PORT")
     mail_username: str = Field(..., env="MAIL_USERNAME")
     mail_password: str = Field(..., env="MAIL_PASSWORD")
     mail_use_tls: bool = True
+    mail_outbox: MailOutboxSettings = MailOutboxSettings()
+
+    quote_index_refresh_s: int = 60
+    local_cache_size: int = 50000
+    local_cache_ttl_s: int = 300
 
     rate_limit: RateLimitSettings = RateLimitSettings()
+    password_hash: PasswordHashSettings = PasswordHashSettings()
+    motivation: MotivationSettings = MotivationSettings()
+    audit: AuditSettings = AuditSettings()
+    retention: RetentionSettings = RetentionSettings()
+    provisioning: ProvisioningSettings = ProvisioningSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
+    lifespan: LifespanSettings = LifespanSettings()
 
     class Config:
         env_file = ".env"
@@ -1,23 +1,305 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKOUTS,
+    DB_POOL_IN_USE,
+    DB_POOL_WAIT_SECONDS,
+    DB_QUERY_SECONDS,
+    DB_READS,
+    DB_REPLICA_HEALTHY,
+    DB_REPLICA_LAG_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_LABEL = "primary"
+
+# Pass as ``bind_arguments`` to send one statement to the primary whatever the routing would pick.
+PRIMARY = {"primary": True}
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    engine_label = PRIMARY_LABEL
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.engine_label = self.engine_label
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.engine_label).observe(time.perf_counter() - started)
+
+
+_QUERY_OPS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def _query_op(statement: str) -> str:
+    op = statement.lstrip()[:6].upper()
+    return op if op in _QUERY_OPS else "OTHER"
+
+
+def _create_engine(url: str, label: str) -> AsyncEngine:
+    """An engine whose pool and statement timings are labelled ``label``."""
+    engine = create_async_engine(
+        url,
+        echo=False,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        poolclass=TimedQueuePool,
+    )
+    sync_engine = engine.sync_engine
+    sync_engine.pool.engine_label = label
+    query_seconds = {op: DB_QUERY_SECONDS.labels(label, op) for op in (*_QUERY_OPS, "OTHER")}
+    checkouts = DB_POOL_CHECKOUTS.labels(label)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_seconds[_query_op(statement)].observe(time.perf_counter() - context._query_started)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine.pool, "checkout", on_checkout)
+    DB_POOL_IN_USE.labels(label).set_function(lambda: sync_engine.pool.checkedout())
+    return engine
+
+
+_engine: AsyncEngine | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """The process-wide primary engine, created on first use so importing the app opens nothing."""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(settings.database_url, PRIMARY_LABEL)
+    return _engine
+
+
+class Replica:
+    """A read replica engine and what its last health check saw.
+
+    Replicas start out of rotation and join it once a check passes, so
+    processes that never run the checks (CLIs, scripts) read from the primary.
+    """
+
+    def __init__(self, label: str, url: str):
+        self.label = label
+        self.engine = _create_engine(url, label)
+        self.healthy = False
+        self.checked = False
+        self.lag_s: float | None = None
+        event.listen(self.engine.sync_engine, "handle_error", self._on_error)
+        DB_REPLICA_HEALTHY.labels(label).set(0)
+
+    def mark(self, healthy: bool, lag_s: float | None = None, reason: str = "") -> None:
+        if healthy and not self.healthy:
+            logger.info("Replica %s joined the read rotation (lag %.1fs)", self.label, lag_s or 0.0)
+        elif not healthy and self.healthy:
+            logger.warning("Replica %s left the read rotation: %s", self.label, reason)
+        self.healthy = healthy
+        self.lag_s = lag_s
+        DB_REPLICA_HEALTHY.labels(self.label).set(int(healthy))
+        if lag_s is not None:
+            DB_REPLICA_LAG_SECONDS.labels(self.label).set(lag_s)
+
+    def _on_error(self, context) -> None:
+        # The statement in flight still fails; later reads go elsewhere until a check passes.
+        if context.is_disconnect:
+            self.mark(False, reason=repr(context.original_exception))
+
+
+_replicas: list[Replica] | None = None
+_next_replica = itertools.count()
+
+
+def get_replicas() -> list[Replica]:
+    global _replicas
+    if _replicas is None:
+        _replicas = [Replica(f"replica{i}", url) for i, url in enumerate(settings.database_replica_urls)]
+    return _replicas
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to a healthy replica and everything else to the primary.
+
+    Flushes, DML, ``FOR UPDATE`` and textual SQL go to the primary. After a
+    flush, DML or ``FOR UPDATE`` the session is pinned there for good, so a
+    request always reads its own writes. ``bind_arguments=PRIMARY`` sends a
+    single statement there.
+    """
+
+    _pinned = False
+
+    def get_bind(self, mapper=None, *, clause=None, bind=None, primary=False, **kw):
+        if bind is not None:
+            return bind
+        primary_engine = get_engine().sync_engine
+        replicas = get_replicas()
+        if not replicas:
+            return primary_engine
+        if self._flushing or (clause is not None and clause.is_dml):
+            self._pinned = True
+            return primary_engine
+        if clause is None or not clause.is_select:
+            return primary_engine
+        if getattr(clause, "_for_update_arg", None) is not None:
+            self._pinned = True
+        if self._pinned or primary:
+            DB_READS.labels("pinned").inc()
+            return primary_engine
+        healthy = [replica for replica in replicas if replica.healthy]
+        if not healthy:
+            DB_READS.labels("fallback").inc()
+            return primary_engine
+        DB_READS.labels("replica").inc()
+        return healthy[next(_next_replica) % len(healthy)].engine.sync_engine
+
+
+# MySQL 8.0.22+ first; older MySQL and MariaDB only know the SLAVE spelling.
+_STATUS_QUERIES = ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS")
+_LAG_COLUMNS = ("Seconds_Behind_Source", "Seconds_Behind_Master")
+
+
+async def _replication_lag(conn: AsyncConnection) -> float:
+    """Seconds the replica is behind the primary.
+
+    Raises when the server cannot report its status, is not replicating, or
+    is not a replica at all. Non-MySQL engines (SQLite in development) are
+    only pinged and report 0.
+    """
+    if conn.dialect.name not in ("mysql", "mariadb"):
+        await conn.execute(text("SELECT 1"))
+        return 0.0
+    for query in _STATUS_QUERIES:
+        try:
+            status = (await conn.execute(text(query))).mappings().first()
+        except DBAPIError as exc:
+            error = exc
+            continue
+        if status is None:
+            raise RuntimeError(f"{query} returned nothing; the server is not a replica")
+        column = next((column for column in _LAG_COLUMNS if column in status), None)
+        if column is None:
+            raise RuntimeError(f"{query} has no lag column")
+        if status[column] is None:
+            raise RuntimeError("replication is not running")
+        return float(status[column])
+    raise RuntimeError(f"cannot read replication status (needs REPLICATION CLIENT): {error}") from error
+
+
+async def _check_replica(replica: Replica) -> None:
+    options = settings.replicas
+    lag_s: float | None = None
+    try:
+        async with asyncio.timeout(options.check_timeout_s):
+            async with replica.engine.connect() as conn:
+                lag_s = await _replication_lag(conn)
+    except TimeoutError:
+        healthy, reason = False, "health check timed out"
+    except Exception as exc:
+        healthy, reason = False, str(exc) or type(exc).__name__
+    else:
+        healthy = not 0 < options.max_lag_s < lag_s
+        reason = "" if healthy else f"lag {lag_s:.1f}s over {options.max_lag_s:.1f}s"
+    if not healthy and not replica.checked:
+        # A replica that never passes would otherwise never log anything: mark() only reports changes.
+        logger.error("Replica %s failed its first health check and stays out of rotation: %s", replica.label, reason)
+    replica.checked = True
+    replica.mark(healthy, lag_s, reason)
+
+
+async def check_replicas() -> None:
+    """Probe every replica once, moving it in or out of the read rotation."""
+    await asyncio.gather(*map(_check_replica, get_replicas()))
+
+
+async def run_replica_monitor() -> None:
+    while True:
+        await asyncio.sleep(settings.replicas.check_interval_s)
+        await check_replicas()
+
+
+_replica_monitor: asyncio.Task | None = None
+
+
+def start_replica_monitor() -> None:
+    global _replica_monitor
+    if get_replicas() and _replica_monitor is None:
+        _replica_monitor = asyncio.create_task(run_replica_monitor())
+
+
+async def stop_replica_monitor() -> None:
+    global _replica_monitor
+    if _replica_monitor is None:
+        return
+    _replica_monitor.cancel()
+    try:
+        await _replica_monitor
+    except asyncio.CancelledError:
+        pass
+    _replica_monitor = None
+
+
+async def warm_engine(connections: int) -> None:
+    """Open ``connections`` pooled connections per engine at once so early requests skip connect and TLS."""
+
+    async def warm(engine: AsyncEngine) -> None:
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = await engine.connect()
+                opened.append(conn)
+                await conn.execute(text("SELECT 1"))
+        finally:
+            for conn in opened:
+                await conn.close()
+
+    await warm(get_engine())
+    # A replica that cannot be warmed just stays out of rotation until a check passes.
+    await asyncio.gather(*(warm(replica.engine) for replica in get_replicas()), return_exceptions=True)
+
+
+async def dispose_engine() -> None:
+    if _engine is not None:
+        await _engine.dispose()
+    for replica in _replicas or ():
+        await replica.engine.dispose()
+
+
+class _LazySessionMaker(async_sessionmaker):
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
 
-AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
+AsyncSessionLocal = _LazySessionMaker(
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False,
 )
 
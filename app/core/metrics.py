@@ -0,0 +1,193 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+PASSWORD_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Argon2 jobs submitted to the worker pool and not yet finished",
+)
+PASSWORD_WAIT_SECONDS = Histogram(
+    "password_hash_wait_seconds",
+    "Time Argon2 jobs spent queued before a worker picked them up",
+    ["op"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PASSWORD_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Argon2 jobs rejected because the worker pool was saturated",
+    ["op"],
+)
+
+MOTIVATION_CACHE = Counter(
+    "motivation_cache_total",
+    "Motivation message cache lookups by result",
+    ["result"],
+)
+MOTIVATION_STAMPEDE = Counter(
+    "motivation_cache_stampede_total",
+    "Cache misses that waited on another in-flight generation instead of calling the model",
+    ["scope"],
+)
+MOTIVATION_PREGENERATED = Counter(
+    "motivation_pregenerated_total",
+    "Per-locale motivation templates produced by the hourly batch",
+    ["result"],
+)
+MOTIVATION_FALLBACK = Counter(
+    "motivation_fallback_total",
+    "Motivation requests answered with the static fallback message",
+    ["reason"],
+)
+LLM_BREAKER_STATE = Gauge(
+    "llm_circuit_state",
+    "Model circuit breaker state (0 closed, 1 half-open, 2 open)",
+)
+
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Audit rows buffered in memory and not yet written",
+)
+AUDIT_BATCH_ROWS = Histogram(
+    "audit_batch_rows",
+    "Rows written per audit INSERT",
+    buckets=(1, 5, 10, 25, 50, 100, 200, 500),
+)
+AUDIT_DROPPED = Counter(
+    "audit_dropped_total",
+    "Audit rows that were never written",
+    ["reason"],
+)
+
+MAIL_OUTBOX_DEPTH = Gauge(
+    "mail_outbox_depth",
+    "Messages waiting in the Redis outbox",
+)
+MAIL_SEND_SECONDS = Histogram(
+    "mail_send_seconds",
+    "Time spent sending one message over an open SMTP connection",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+MAIL_DELIVERY_SECONDS = Histogram(
+    "mail_delivery_seconds",
+    "Time from enqueue to successful hand-off to the relay",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+MAIL_SENT = Counter(
+    "mail_sent_total",
+    "Outbox send outcomes",
+    ["result"],
+)
+
+ACCESS_TOKEN_CACHE = Counter(
+    "access_token_cache_total",
+    "Verified access-token cache lookups by result",
+    ["result"],
+)
+USER_CACHE = Counter(
+    "user_profile_cache_total",
+    "Cached user profile lookups by result",
+    ["result"],
+)
+
+LOCAL_CACHE = Counter(
+    "redis_local_cache_total",
+    "Worker-local Redis cache lookups and invalidations",
+    ["result"],
+)
+LOCAL_CACHE_SIZE = Gauge(
+    "redis_local_cache_entries",
+    "Keys held in the worker-local Redis cache",
+)
+
+RETENTION_DELETED = Counter(
+    "retention_deleted_total",
+    "Rows (or audit partitions) removed by the retention sweeper",
+    ["policy"],
+)
+RETENTION_BATCH_SECONDS = Histogram(
+    "retention_batch_seconds",
+    "Time per retention delete batch",
+    ["policy"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+RETENTION_LAST_RUN = Gauge(
+    "retention_last_run_timestamp",
+    "Unix time the retention policy last completed",
+    ["policy"],
+)
+
+PROVISIONED_USERS = Counter(
+    "provisioned_users_total",
+    "Rows processed by bulk user provisioning",
+    ["status"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template and status class",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the SQLAlchemy pool",
+    ["engine"],
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_in_use",
+    "Connections currently checked out of the SQLAlchemy pool",
+    ["engine"],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection, including opening new ones",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Statement execution time by engine and statement type",
+    ["engine", "op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+DB_READS = Counter(
+    "db_reads_routed_total",
+    "SELECTs by where the routing session sent them (replica, pinned to the primary, or fallback)",
+    ["route"],
+)
+DB_REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy",
+    "1 while the replica is in the read rotation",
+    ["engine"],
+)
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag the last health check saw",
+    ["engine"],
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round-trip time by command; pipelines are a single PIPELINE observation",
+    ["command"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "Argon2 work time inside the pool worker",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 1.0),
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds",
+    "Chat model call latency, streamed calls measured to the last token",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the chat model",
+    ["type"],
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the loop-lag heartbeat woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
@@ -1,6 +1,54 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError, RedisError, ResponseError
 
 from app.core.config import settings
+from app.core.metrics import LOCAL_CACHE, LOCAL_CACHE_SIZE, REDIS_COMMAND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TRACKING_CHANNEL = "__redis__:invalidate"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+_command_seconds: dict[str, Any] = {}
+
+
+def _observe_command(command: str, started: float) -> None:
+    child = _command_seconds.get(command)
+    if child is None:
+        child = _command_seconds[command] = REDIS_COMMAND_SECONDS.labels(command)
+    child.observe(time.perf_counter() - started)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _observe_command("PIPELINE", started)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that times every command round trip."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            _observe_command(str(args[0]).split(" ", 1)[0].upper(), started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
 
 class RedisClient:
@@ -9,9 +57,196 @@ class RedisClient:
     @classmethod
     def get_client(cls) -> redis.Redis:
         if cls._client is None:
-            cls._client = redis.from_url(settings.redis_url, decode_responses=True)
+            cls._client = InstrumentedRedis.from_url(settings.redis_url, decode_responses=True)
         return cls._client
 
+    @classmethod
+    async def warm(cls, connections: int) -> None:
+        """Open ``connections`` pooled connections at once, leaving them idle in the pool."""
+        pool = cls.get_client().connection_pool
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = await pool.get_connection("PING")
+                opened.append(conn)
+                await conn.send_command("PING")
+                await conn.read_response()
+        finally:
+            for conn in opened:
+                await pool.release(conn)
+
+    @classmethod
+    async def close(cls) -> None:
+        if cls._client is None:
+            return
+        client, cls._client = cls._client, None
+        await client.aclose()
+
+
+class LuaScript:
+    registry: list["LuaScript"] = []
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+        LuaScript.registry.append(self)
+
+    async def __call__(self, redis_conn: redis.Redis, keys: list[str], args: list) -> object:
+        try:
+            return await redis_conn.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            await redis_conn.script_load(self.source)
+            return await redis_conn.evalsha(self.sha, len(keys), *keys, *args)
+
+
+async def load_scripts(redis_conn: redis.Redis) -> None:
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for script in LuaScript.registry:
+            pipe.script_load(script.source)
+        await pipe.execute()
+
+
+class TrackedCache:
+    """Worker-local cache for keys under ``prefixes``, invalidated by Redis.
+
+    A dedicated connection subscribes to ``__redis__:invalidate`` and a
+    second one turns on ``CLIENT TRACKING ... BCAST`` for the prefixes with
+    invalidations redirected to it, so any write or expiry of a tracked key
+    evicts it here. Servers without client tracking fall back to the
+    ``cache:invalidate`` channel, which writers publish to via ``publish_invalidation``.
+    While the invalidation link is down every lookup goes to Redis.
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float) -> None:
+        self.prefixes: list[str] = []
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._pending: dict[str, object] = {}
+        self._connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._connected.is_set()
+
+    def track(self, *prefixes: str) -> None:
+        """Register key prefixes; call at import time, before ``start``."""
+        self.prefixes.extend(p for p in prefixes if p not in self.prefixes)
+
+    def start(self, client: redis.Redis) -> None:
+        if self._task is None and self.maxsize > 0 and self.prefixes:
+            self._task = asyncio.create_task(self._listen(client))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def invalidate(self, key: str | None = None) -> None:
+        if key is None:
+            self._entries.clear()
+            self._pending.clear()
+        else:
+            self._entries.pop(key, None)
+            self._pending.pop(key, None)
+        LOCAL_CACHE.labels("invalidated").inc()
+        LOCAL_CACHE_SIZE.set(len(self._entries))
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]], *, cache_if: Callable[[Any], bool]) -> Any:
+        if not self.active:
+            return await loader()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            LOCAL_CACHE.labels("hit").inc()
+            return entry[0]
+        LOCAL_CACHE.labels("miss").inc()
+
+        # An invalidation that lands while the read is in flight clears the marker,
+        # so a value read just before a write is never stored.
+        marker = object()
+        self._pending[key] = marker
+        value = await loader()
+        if self._pending.get(key) is marker:
+            del self._pending[key]
+            if self.active and cache_if(value):
+                self._entries[key] = (value, time.monotonic() + self.ttl_s)
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                LOCAL_CACHE_SIZE.set(len(self._entries))
+        return value
+
+    async def _subscribe(self, client: redis.Redis):
+        listener = client.connection_pool.make_connection()
+        tracker = client.connection_pool.make_connection()
+        try:
+            await listener.connect()
+            await tracker.connect()
+            try:
+                await listener.send_command("CLIENT", "ID")
+                listener_id = await listener.read_response()
+                args = ["CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST"]
+                for prefix in self.prefixes:
+                    args += ["PREFIX", prefix]
+                await tracker.send_command(*args)
+                await tracker.read_response()
+            except ResponseError:
+                logger.warning("CLIENT TRACKING unavailable; falling back to the %s channel", INVALIDATION_CHANNEL)
+            await listener.send_command("SUBSCRIBE", TRACKING_CHANNEL, INVALIDATION_CHANNEL)
+            for _ in range(2):
+                await listener.read_response()
+        except BaseException:
+            # _listen only cleans up connections it got back; these never reached it.
+            for conn in (listener, tracker):
+                await conn.disconnect()
+            raise
+        return listener, tracker
+
+    async def _listen(self, client: redis.Redis) -> None:
+        while True:
+            listener = tracker = None
+            try:
+                listener, tracker = await self._subscribe(client)
+                self.invalidate()
+                self._connected.set()
+                while True:
+                    message = await listener.read_response()
+                    if not isinstance(message, list) or len(message) < 3 or message[0] != "message":
+                        continue
+                    keys = message[2]
+                    if keys is None:
+                        self.invalidate()
+                    elif isinstance(keys, list):
+                        for key in keys:
+                            self.invalidate(key)
+                    else:
+                        self.invalidate(keys)
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError):
+                logger.warning("Local cache invalidation link lost; retrying", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                self._connected.clear()
+                self.invalidate()
+                for conn in (listener, tracker):
+                    if conn is not None:
+                        await conn.disconnect()
+
+
+local_cache = TrackedCache(maxsize=settings.local_cache_size, ttl_s=settings.local_cache_ttl_s)
+
+
+async def publish_invalidation(redis_conn: redis.Redis, key: str) -> None:
+    await redis_conn.publish(INVALIDATION_CHANNEL, key)
+
 
 async def get_redis() -> redis.Redis:
     yield RedisClient.get_client()
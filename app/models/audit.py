@@ -1,20 +1,15 @@
 from sqlalchemy import Column, DateTime, String, func
-from sqlalchemy.dialects.mysql import CHAR
 
 from app.core.db import Base
-import uuid
-
-
-def uuid_str() -> str:
-    return str(uuid.uuid4())
+from app.models.types import BinaryUUID, uuid7_str
 
 
 class AuthAudit(Base):
     __tablename__ = "auth_audit"
 
-    id = Column(CHAR(36), primary_key=True, default=uuid_str)
-    user_id = Column(CHAR(36))
+    id = Column(BinaryUUID, primary_key=True, default=uuid7_str)
+    user_id = Column(BinaryUUID)
     event = Column(String(64), nullable=False)
     ip = Column(String(64))
     ua = Column(String(512))
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
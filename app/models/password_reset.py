@@ -1,18 +1,13 @@
 from sqlalchemy import Column, DateTime, Integer, String, func
-from sqlalchemy.dialects.mysql import CHAR
 
 from app.core.db import Base
-import uuid
-
-
-def uuid_str() -> str:
-    return str(uuid.uuid4())
+from app.models.types import BinaryUUID, uuid7_str
 
 
 class PasswordReset(Base):
     __tablename__ = "password_resets"
 
-    id = Column(CHAR(36), primary_key=True, default=uuid_str)
+    id = Column(BinaryUUID, primary_key=True, default=uuid7_str)
     email_lower = Column(String(255), index=True, nullable=False)
     otp_hash = Column(String(255), nullable=False)
     otp_expires_at = Column(DateTime(timezone=True), nullable=False)
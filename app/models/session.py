@@ -1,25 +1,20 @@
 from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
-from sqlalchemy.dialects.mysql import CHAR
 
 from app.core.db import Base
-import uuid
-
-
-def uuid_str() -> str:
-    return str(uuid.uuid4())
+from app.models.types import BinaryUUID, uuid7_str
 
 
 class Session(Base):
     __tablename__ = "sessions"
 
-    id = Column(CHAR(36), primary_key=True, default=uuid_str)
-    user_id = Column(CHAR(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    jti = Column(CHAR(36), unique=True, nullable=False)
-    family_id = Column(CHAR(36), nullable=False)
+    id = Column(BinaryUUID, primary_key=True, default=uuid7_str)
+    user_id = Column(BinaryUUID, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    jti = Column(BinaryUUID, unique=True, nullable=False)
+    family_id = Column(BinaryUUID, nullable=False)
     user_agent = Column(String(512))
     ip_hash = Column(String(128))
     idx = Column(Integer, default=0, nullable=False)
     last_rotated_at = Column(DateTime(timezone=True))
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    revoked_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True), index=True)
@@ -1,18 +1,13 @@
 from sqlalchemy import Boolean, Column, DateTime, String, func
-from sqlalchemy.dialects.mysql import CHAR
 
 from app.core.db import Base
-import uuid
-
-
-def uuid_str() -> str:
-    return str(uuid.uuid4())
+from app.models.types import BinaryUUID, uuid7_str
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(CHAR(36), primary_key=True, default=uuid_str)
+    id = Column(BinaryUUID, primary_key=True, default=uuid7_str)
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     name = Column(String(120), nullable=True)
@@ -0,0 +1,20 @@
+from typing import Literal
+
+from pydantic import BaseModel, EmailStr, Field
+
+
+class ProvisionUserIn(BaseModel):
+    email: EmailStr
+    password: str | None = Field(None, min_length=8)
+    name: str | None = Field(None, max_length=120)
+    tz: str = Field("Asia/Seoul", max_length=64)
+    locale: str = Field("ko-KR", max_length=16)
+    email_verified: bool = False
+
+
+class ProvisionResult(BaseModel):
+    line: int
+    email: str | None = None
+    status: Literal["created", "exists", "duplicate", "invalid", "error"]
+    id: str | None = None
+    error: str | None = None
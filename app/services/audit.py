@@ -1,6 +1,148 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
 
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import AUDIT_BATCH_ROWS, AUDIT_DROPPED, AUDIT_QUEUE_DEPTH
 from app.models.audit import AuthAudit
+from app.models.types import uuid7_str
+
+logger = logging.getLogger(__name__)
+
+BACKPRESSURE_BLOCK = "block"
+BACKPRESSURE_DROP = "drop"
+BACKPRESSURE_SYNC = "sync"
+
+_STOP = object()
+
+# Session.info key for rows waiting on the caller's commit.
+_PENDING_KEY = "audit_pending"
+
+
+class AuditWriter:
+    """Buffers audit rows in memory and writes them as multi-row INSERTs.
+
+    A row only joins the queue once the caller's transaction commits, so a
+    rolled-back request leaves no audit trail. A background task flushes
+    every ``batch_size`` rows or ``flush_ms`` milliseconds, whichever comes
+    first. Rows waiting on a commit hold a queue slot too; when none is free
+    the ``backpressure`` setting decides whether callers wait, the row is
+    dropped, or the row is written in the caller's own transaction.
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(settings.audit.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting rows and flush everything already queued."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        await self._queue.put(_STOP)
+        await task
+
+    async def submit(self, row: dict, db: AsyncSession) -> None:
+        """Hold a slot for ``row`` and queue it when ``db`` commits."""
+        if self._slots.locked():
+            mode = settings.audit.backpressure
+            if mode == BACKPRESSURE_DROP:
+                AUDIT_DROPPED.labels("queue_full").inc()
+                return
+            if mode == BACKPRESSURE_SYNC:
+                db.add(AuthAudit(**row))
+                await db.flush()
+                return
+        await self._slots.acquire()
+        db.sync_session.info.setdefault(_PENDING_KEY, []).append(row)
+
+    def _enqueue(self, rows: list[dict]) -> None:
+        if self._task is None:
+            # Committed after shutdown began; the batcher is gone.
+            AUDIT_DROPPED.labels("stopped").inc(len(rows))
+            return
+        for row in rows:
+            self._queue.put_nowait(row)
+        AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _discard(self, rows: list[dict]) -> None:
+        for _ in rows:
+            self._slots.release()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + settings.audit.flush_ms / 1000
+            while len(batch) < settings.audit.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            for _ in batch:
+                self._slots.release()
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+            await self._write(batch)
+
+    async def _write(self, batch: list[dict]) -> None:
+        try:
+            async with AsyncSessionLocal() as db, db.begin():
+                await db.execute(insert(AuthAudit).values(batch))
+        except Exception:
+            logger.exception("Failed to write %d audit rows", len(batch))
+            AUDIT_DROPPED.labels("write_error").inc(len(batch))
+            return
+        AUDIT_BATCH_ROWS.observe(len(batch))
+
+
+writer = AuditWriter()
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_committed(session: Session) -> None:
+    rows = session.info.pop(_PENDING_KEY, None)
+    if rows:
+        writer._enqueue(rows)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_uncommitted(session: Session, transaction: SessionTransaction) -> None:
+    # Rows still pending when the outermost transaction ends were rolled back.
+    if transaction.parent is None:
+        rows = session.info.pop(_PENDING_KEY, None)
+        if rows:
+            writer._discard(rows)
 
 
 async def record_event(
@@ -11,6 +153,16 @@ async def record_event(
     ip: str | None,
     user_agent: str | None,
 ) -> None:
-    audit = AuthAudit(user_id=user_id, event=event, ip=ip, ua=user_agent)
-    db.add(audit)
-    await db.flush()
+    row = {
+        "id": uuid7_str(),
+        "user_id": user_id,
+        "event": event,
+        "ip": ip,
+        "ua": user_agent,
+        "created_at": datetime.now(timezone.utc),
+    }
+    if not writer.running:
+        db.add(AuthAudit(**row))
+        await db.flush()
+        return
+    await writer.submit(row, db)
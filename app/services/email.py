@@ -1,22 +1,304 @@
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
+
+import aiosmtplib
+import redis.asyncio as redis
 
 from app.core.config import settings
+from app.core.metrics import MAIL_DELIVERY_SECONDS, MAIL_OUTBOX_DEPTH, MAIL_SEND_SECONDS, MAIL_SENT
+from app.core.redis import RedisClient
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "mail:outbox"
+OUTBOX_RETRY_KEY = "mail:outbox:retry"
+OUTBOX_DEAD_KEY = "mail:outbox:dead"
+# Each dispatcher moves what it pops into its own processing list and registers
+# itself in the workers set, with a heartbeat key that expires if it dies.
+OUTBOX_PROCESSING_PREFIX = "mail:outbox:processing:"
+OUTBOX_WORKERS_KEY = "mail:outbox:workers"
+OUTBOX_ALIVE_PREFIX = "mail:outbox:alive:"
+MAIL_FROM_NAME = "AI Todo"
 
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_sender,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_host,
-    MAIL_FROM_NAME="AI Todo",
-    MAIL_STARTTLS=settings.mail_use_tls,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-)
+@lru_cache(maxsize=1)
+def _fastmail():
+    # fastapi-mail is only needed when the outbox is off; import and configure it on first send.
+    from fastapi_mail import ConnectionConfig, FastMail
+
+    return FastMail(
+        ConnectionConfig(
+            MAIL_USERNAME=settings.mail_username,
+            MAIL_PASSWORD=settings.mail_password,
+            MAIL_FROM=settings.mail_sender,
+            MAIL_PORT=settings.mail_port,
+            MAIL_SERVER=settings.mail_host,
+            MAIL_FROM_NAME=MAIL_FROM_NAME,
+            MAIL_STARTTLS=settings.mail_use_tls,
+            MAIL_SSL_TLS=False,
+            USE_CREDENTIALS=True,
+        )
+    )
 
 
 async def send_mail(subject: str, recipients: list[str], body: str) -> None:
+    from fastapi_mail import MessageSchema
+
     message = MessageSchema(subject=subject, recipients=recipients, body=body, subtype="html")
-    mailer = FastMail(conf)
-    await mailer.send_message(message)
+    await _fastmail().send_message(message)
+
+
+async def queue_mail(
+    subject: str, recipients: list[str], body: str, redis_conn: redis.Redis | None = None
+) -> None:
+    """Hand the message to the outbox, or send it inline when the outbox is disabled."""
+    if not settings.mail_outbox.enabled:
+        await send_mail(subject, recipients, body)
+        return
+    redis_conn = redis_conn or RedisClient.get_client()
+    item = {
+        "id": uuid.uuid4().hex,
+        "subject": subject,
+        "recipients": recipients,
+        "body": body,
+        "attempts": 0,
+        "queued_at": time.time(),
+    }
+    await redis_conn.lpush(OUTBOX_KEY, json.dumps(item))
+
+
+_ITEM_FIELDS = {"id", "subject", "recipients", "body", "attempts", "queued_at"}
+
+
+def _parse_item(raw: str) -> dict | None:
+    try:
+        item = json.loads(raw)
+    except ValueError:
+        return None
+    return item if isinstance(item, dict) and _ITEM_FIELDS <= item.keys() else None
+
+
+def _build_message(item: dict) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, settings.mail_sender))
+    message["To"] = ", ".join(item["recipients"])
+    message["Subject"] = item["subject"]
+    message.set_content(item["body"], subtype="html")
+    return message
+
+
+class OutboxDispatcher:
+    """Drains the Redis outbox over one long-lived SMTP connection.
+
+    Messages are moved in batches into this dispatcher's processing list
+    and sent back to back on the same connection; each leaves the list once
+    it is sent, rejected or rescheduled, so a crash loses nothing. Failed
+    messages go to a retry set scored by their next attempt time, with
+    exponential backoff, until ``max_attempts``. The connection is closed
+    after ``idle_close_s`` without traffic.
+    """
+
+    def __init__(self, redis_conn: redis.Redis) -> None:
+        self._redis = redis_conn
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._last_used = 0.0
+        self._worker_id = uuid.uuid4().hex
+        self._processing_key = f"{OUTBOX_PROCESSING_PREFIX}{self._worker_id}"
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.mail_host,
+            port=settings.mail_port,
+            username=settings.mail_username,
+            password=settings.mail_password,
+            start_tls=settings.mail_use_tls,
+            timeout=settings.mail_outbox.smtp_timeout_s,
+        )
+        await smtp.connect()
+        self._smtp = smtp
+        return smtp
+
+    async def close(self) -> None:
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _retry_later(self, item: dict, reason: str) -> None:
+        item["attempts"] += 1
+        if item["attempts"] >= settings.mail_outbox.max_attempts:
+            logger.error("Dropping mail %s after %d attempts: %s", item["id"], item["attempts"], reason)
+            MAIL_SENT.labels("dropped").inc()
+            return
+        backoff = min(
+            settings.mail_outbox.backoff_base_s * 2 ** (item["attempts"] - 1),
+            settings.mail_outbox.backoff_max_s,
+        )
+        backoff *= random.uniform(0.8, 1.2)
+        try:
+            await self._redis.zadd(OUTBOX_RETRY_KEY, {json.dumps(item): time.time() + backoff})
+        except redis.RedisError:
+            # Keep sending the rest of the batch; this message cannot be rescheduled without Redis.
+            logger.exception("Dropping mail %s: could not schedule its retry", item["id"])
+            MAIL_SENT.labels("dropped").inc()
+            return
+        MAIL_SENT.labels("retry").inc()
+
+    async def _promote_due_retries(self) -> None:
+        due = await self._redis.zrangebyscore(OUTBOX_RETRY_KEY, "-inf", time.time(), start=0, num=100)
+        for raw in due:
+            # ZREM decides which dispatcher owns the retry when several see it at once.
+            if await self._redis.zrem(OUTBOX_RETRY_KEY, raw):
+                await self._redis.rpush(OUTBOX_KEY, raw)
+
+    async def _heartbeat(self) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(OUTBOX_WORKERS_KEY, self._worker_id)
+            pipe.set(f"{OUTBOX_ALIVE_PREFIX}{self._worker_id}", "1", ex=settings.mail_outbox.lease_s)
+            await pipe.execute()
+
+    async def _requeue(self, worker_id: str) -> int:
+        """Move a dispatcher's unfinished messages back to the outbox, oldest at the pop end."""
+        processing_key = f"{OUTBOX_PROCESSING_PREFIX}{worker_id}"
+        moved = 0
+        while await self._redis.lmove(processing_key, OUTBOX_KEY, "LEFT", "RIGHT") is not None:
+            moved += 1
+        await self._redis.srem(OUTBOX_WORKERS_KEY, worker_id)
+        return moved
+
+    async def _recover_stale(self) -> None:
+        for worker_id in await self._redis.smembers(OUTBOX_WORKERS_KEY):
+            if worker_id == self._worker_id or await self._redis.exists(f"{OUTBOX_ALIVE_PREFIX}{worker_id}"):
+                continue
+            moved = await self._requeue(worker_id)
+            if moved:
+                logger.warning("Re-queued %d mail(s) left in flight by dispatcher %s", moved, worker_id)
+
+    async def _next_batch(self) -> list[str]:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for _ in range(settings.mail_outbox.batch_size):
+                pipe.lmove(OUTBOX_KEY, self._processing_key, "RIGHT", "LEFT")
+            batch = [raw for raw in await pipe.execute() if raw is not None]
+        if batch:
+            return batch
+        moved = await self._redis.blmove(
+            OUTBOX_KEY, self._processing_key, settings.mail_outbox.poll_s, "RIGHT", "LEFT"
+        )
+        return [moved] if moved is not None else []
+
+    async def _done(self, raw: str) -> None:
+        await self._redis.lrem(self._processing_key, 1, raw)
+
+    async def _bury(self, raw: str) -> None:
+        options = settings.mail_outbox
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.lpush(OUTBOX_DEAD_KEY, raw)
+            pipe.ltrim(OUTBOX_DEAD_KEY, 0, options.dead_max - 1)
+            pipe.expire(OUTBOX_DEAD_KEY, options.dead_ttl_s)
+            pipe.lrem(self._processing_key, 1, raw)
+            await pipe.execute()
+
+    async def _parse_batch(self, batch: list[str]) -> list[tuple[str, dict]]:
+        items = []
+        for raw in batch:
+            item = _parse_item(raw)
+            if item is None:
+                logger.error("Moving malformed outbox entry to %s: %.200r", OUTBOX_DEAD_KEY, raw)
+                MAIL_SENT.labels("malformed").inc()
+                await self._bury(raw)
+                continue
+            items.append((raw, item))
+        return items
+
+    async def _send_batch(self, batch: list[str]) -> None:
+        items = await self._parse_batch(batch)
+        for i, (raw, item) in enumerate(items):
+            try:
+                smtp = await self._connection()
+            except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as exc:
+                # The relay is unreachable; push the whole remainder back with backoff.
+                await self.close()
+                for rest_raw, rest in items[i:]:
+                    await self._retry_later(rest, repr(exc))
+                    await self._done(rest_raw)
+                return
+            started = time.perf_counter()
+            try:
+                await smtp.send_message(_build_message(item))
+            except aiosmtplib.SMTPRecipientsRefused as exc:
+                logger.error("Mail %s rejected by relay: %r", item["id"], exc)
+                MAIL_SENT.labels("rejected").inc()
+                await self._done(raw)
+                continue
+            except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as exc:
+                if not smtp.is_connected:
+                    await self.close()
+                await self._retry_later(item, repr(exc))
+                await self._done(raw)
+                continue
+            await self._done(raw)
+            MAIL_SEND_SECONDS.observe(time.perf_counter() - started)
+            MAIL_DELIVERY_SECONDS.observe(max(time.time() - item["queued_at"], 0.0))
+            MAIL_SENT.labels("sent").inc()
+        self._last_used = time.monotonic()
+
+    async def run(self) -> None:
+        recovered = False
+        try:
+            while True:
+                try:
+                    await self._heartbeat()
+                    if not recovered:
+                        await self._recover_stale()
+                        recovered = True
+                    await self._promote_due_retries()
+                    MAIL_OUTBOX_DEPTH.set(await self._redis.llen(OUTBOX_KEY))
+                    batch = await self._next_batch()
+                    if batch:
+                        await self._send_batch(batch)
+                    elif (
+                        self._smtp is not None
+                        and time.monotonic() - self._last_used > settings.mail_outbox.idle_close_s
+                    ):
+                        await self.close()
+                except redis.RedisError:
+                    logger.exception("Mail outbox unavailable")
+                    await asyncio.sleep(settings.mail_outbox.poll_s)
+        finally:
+            try:
+                # Hand anything still in flight back to the outbox for the other dispatchers.
+                await self._requeue(self._worker_id)
+                await self._redis.delete(f"{OUTBOX_ALIVE_PREFIX}{self._worker_id}")
+            except redis.RedisError:
+                logger.warning("Could not re-queue in-flight mail; another dispatcher recovers it on start")
+            await self.close()
+
+
+_dispatchers: list[asyncio.Task] = []
+
+
+def start_dispatchers(redis_conn: redis.Redis | None = None) -> None:
+    if not settings.mail_outbox.enabled or _dispatchers:
+        return
+    redis_conn = redis_conn or RedisClient.get_client()
+    for _ in range(settings.mail_outbox.workers):
+        _dispatchers.append(asyncio.create_task(OutboxDispatcher(redis_conn).run()))
+
+
+async def stop_dispatchers() -> None:
+    for task in _dispatchers:
+        task.cancel()
+    await asyncio.gather(*_dispatchers, return_exceptions=True)
+    _dispatchers.clear()
@@ -1,17 +1,33 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
 from datetime import datetime, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, NamedTuple, Optional
 
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+import redis.asyncio as redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.quotes import get_quote_for_current_hour
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import (
+    LLM_BREAKER_STATE,
+    MOTIVATION_CACHE,
+    MOTIVATION_FALLBACK,
+    MOTIVATION_PREGENERATED,
+    MOTIVATION_STAMPEDE,
+)
+from app.core.redis import LuaScript, RedisClient
+from app.services.quotes import IndexedQuote, get_quote_for_current_hour, hour_index_for, quote_index
+from app.utils.circuitbreaker import CircuitBreaker, CircuitOpen
+from app.utils.singleflight import SingleFlight
 
-model = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
-parser = StrOutputParser()
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
-prompt = ChatPromptTemplate.from_template(
+MESSAGE_PROMPT = (
     "You are a friendly motivational assistant for a productivity app.\n"
     "User name: {user_name}\n"
     "Use the given quote as the anchor and craft a short motivational message.\n"
@@ -23,26 +39,489 @@ prompt = ChatPromptTemplate.from_template(
     "- Assume this message is for the current hour of the day.\n"
 )
 
+NAME_PLACEHOLDER = "{name}"
 
-async def generate_hourly_motivation(
-    db: AsyncSession,
+TEMPLATE_PROMPT = (
+    "You are a friendly motivational assistant for a productivity app.\n"
+    "Use the given quote as the anchor and craft a short motivational message.\n"
+    'Quote: "{quote_text}" by {quote_author}\n'
+    "Locale: {locale}\n"
+    "Constraints:\n"
+    "- Under 30 words\n"
+    "- Concise and positive\n"
+    "- Write in the language of the locale when one is given\n"
+    "- Address the user exactly once with the literal placeholder {{name}}; never invent a name\n"
+    "- Assume this message is for the current hour of the day.\n"
+)
+
+FALLBACK_MESSAGE = "Keep going. Small steps this hour become big wins tomorrow."
+
+CACHE_PREFIX = "motivation:msg:"
+CACHE_LOCK_PREFIX = "motivation:lock:"
+TEMPLATE_PREFIX = "motivation:tmpl:"
+PREGEN_LOCK_PREFIX = "motivation:pregen:"
+
+logger = logging.getLogger(__name__)
+
+# KEYS: lock; ARGV: token. Only the holder may release the lock.
+_RELEASE_LOCK = LuaScript(
+    """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+)
+
+_flights = SingleFlight()
+
+_BREAKER_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+breaker = CircuitBreaker(
+    failure_threshold=settings.motivation.breaker_failures,
+    reset_timeout_s=settings.motivation.breaker_reset_s,
+    on_state_change=lambda state: LLM_BREAKER_STATE.set(_BREAKER_STATES[state]),
+)
+
+
+_model: "BaseChatModel | None" = None
+
+
+def get_model() -> "BaseChatModel":
+    """The chat model, built on first use so that importing this module does not load langchain."""
+    global _model
+    if _model is None:
+        from langchain_openai import ChatOpenAI
+
+        from app.utils.llmmetrics import LLMMetricsHandler
+
+        _model = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.7,
+            timeout=settings.motivation.llm_timeout_s,
+            max_retries=settings.motivation.llm_max_retries,
+            callbacks=[LLMMetricsHandler()],
+        )
+    return _model
+
+
+def set_model(chat_model: "BaseChatModel") -> None:
+    """Replace the chat model, e.g. with a fake in benchmarks."""
+    global _model
+    _model = chat_model
+
+
+@lru_cache(maxsize=1)
+def _prompts():
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return (
+        ChatPromptTemplate.from_template(MESSAGE_PROMPT),
+        ChatPromptTemplate.from_template(TEMPLATE_PROMPT),
+        StrOutputParser(),
+    )
+
+
+def _message_chain():
+    prompt, _, parser = _prompts()
+    return prompt | get_model() | parser
+
+
+def _normalize_name(user_name: str) -> str:
+    return " ".join(user_name.split()).casefold()[:120]
+
+
+def _cache_key(hour_index: int, locale: str | None, quote_id: int, user_name: str) -> str:
+    name_digest = hashlib.sha1(_normalize_name(user_name).encode()).hexdigest()[:16]
+    return f"{CACHE_PREFIX}{hour_index}:{locale or '*'}:{quote_id}:{name_digest}"
+
+
+def _template_key(hour_index: int, locale: str | None, quote_id: int) -> str:
+    return f"{TEMPLATE_PREFIX}{hour_index}:{locale or '*'}:{quote_id}"
+
+
+def _seconds_to_hour_end(now: datetime) -> int:
+    return max(3600 - int(now.timestamp()) % 3600, 1)
+
+
+def render_template(template: str, user_name: str) -> str:
+    name = " ".join(user_name.split())[:120] or "Friend"
+    return template.replace(NAME_PLACEHOLDER, name)
+
+
+def _fallback(reason: str) -> str:
+    MOTIVATION_FALLBACK.labels(reason).inc()
+    return FALLBACK_MESSAGE
+
+
+def _fallback_reason(exc: BaseException) -> str:
+    if isinstance(exc, CircuitOpen):
+        return "open"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    logger.warning("Motivation generation failed: %r", exc)
+    return "error"
+
+
+async def _invoke_model(quote: IndexedQuote, user_name: str) -> str:
+    breaker.before_call()
+    chain = _message_chain()
+    try:
+        message = await asyncio.wait_for(
+            chain.ainvoke(
+                {
+                    "user_name": user_name,
+                    "quote_text": quote.text,
+                    "quote_author": quote.author or "Unknown",
+                }
+            ),
+            settings.motivation.llm_timeout_s,
+        )
+    except asyncio.CancelledError:
+        # The caller gave up (request budget, disconnect, shutdown); that says nothing about the model.
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return message
+
+
+async def _stream_model(quote: IndexedQuote, user_name: str) -> AsyncIterator[str]:
+    breaker.before_call()
+    chain = _message_chain()
+    stream = chain.astream(
+        {
+            "user_name": user_name,
+            "quote_text": quote.text,
+            "quote_author": quote.author or "Unknown",
+        }
+    )
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.motivation.llm_timeout_s
+    # The first chunk has to arrive within the request budget; the rest within the overall model timeout.
+    timeout = min(settings.motivation.budget_s, settings.motivation.llm_timeout_s)
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), max(timeout, 0))
+            except StopAsyncIteration:
+                break
+            timeout = deadline - loop.time()
+            if chunk:
+                yield chunk
+    except GeneratorExit:
+        # The client went away mid-stream; the model itself was answering.
+        breaker.record_success()
+        raise
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+
+
+async def _generate_and_store(
+    redis_conn: redis.Redis, key: str, quote: IndexedQuote, user_name: str, ttl_s: int
+) -> str:
+    lock_key = f"{CACHE_LOCK_PREFIX}{key}"
+    token = uuid.uuid4().hex
+    lock_ms = settings.motivation.lock_timeout_s * 1000
+    if not await redis_conn.set(lock_key, token, nx=True, px=lock_ms):
+        # Another worker is generating this key; wait for its result instead of calling the model too.
+        deadline = time.monotonic() + settings.motivation.lock_timeout_s
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.motivation.lock_poll_ms / 1000)
+            cached = await redis_conn.get(key)
+            if cached is not None:
+                MOTIVATION_STAMPEDE.labels("remote").inc()
+                return cached
+            if not await redis_conn.exists(lock_key):
+                break
+        if not await redis_conn.set(lock_key, token, nx=True, px=lock_ms):
+            # Still held after a full lock timeout: the holder is stuck or the model is slow.
+            # Piling another call on top would not help either.
+            cached = await redis_conn.get(key)
+            if cached is not None:
+                MOTIVATION_STAMPEDE.labels("remote").inc()
+                return cached
+            return _fallback("busy")
+
+    try:
+        message = await _invoke_model(quote, user_name)
+        await redis_conn.set(key, message, ex=ttl_s)
+        return message
+    finally:
+        await _RELEASE_LOCK(redis_conn, [lock_key], [token])
+
+
+async def _cached_message(
+    redis_conn: redis.Redis, hour_index: int, locale: str | None, quote: IndexedQuote, user_name: str
+) -> str | None:
+    if settings.motivation.pregen_enabled:
+        template = await redis_conn.get(_template_key(hour_index, locale, quote.id))
+        if template is not None:
+            MOTIVATION_CACHE.labels("template").inc()
+            return render_template(template, user_name)
+
+    cached = await redis_conn.get(_cache_key(hour_index, locale, quote.id, user_name))
+    if cached is not None:
+        MOTIVATION_CACHE.labels("hit").inc()
+        return cached
+    MOTIVATION_CACHE.labels("miss").inc()
+    return None
+
+
+async def motivation_for_quote(
+    quote: IndexedQuote | None,
     user_name: str,
+    *,
     locale: Optional[str] = None,
     now: Optional[datetime] = None,
+    redis_conn: redis.Redis | None = None,
 ) -> str:
+    if not quote:
+        return FALLBACK_MESSAGE
+    budget_s = settings.motivation.budget_s
+    if not settings.motivation.cache_enabled:
+        try:
+            return await asyncio.wait_for(_invoke_model(quote, user_name), budget_s)
+        except Exception as exc:
+            return _fallback(_fallback_reason(exc))
+
     if now is None:
         now = datetime.now(timezone.utc)
+    redis_conn = redis_conn or RedisClient.get_client()
+
+    cached = await _cached_message(redis_conn, hour_index_for(now), locale, quote, user_name)
+    if cached is not None:
+        return cached
+
+    key = _cache_key(hour_index_for(now), locale, quote.id, user_name)
+    ttl_s = _seconds_to_hour_end(now)
+    # Shielded so a generation that overruns the budget still finishes and fills the cache.
+    flight = asyncio.shield(
+        _flights.do(key, lambda: _generate_and_store(redis_conn, key, quote, user_name, ttl_s))
+    )
+    try:
+        message, shared = await asyncio.wait_for(flight, budget_s)
+    except Exception as exc:
+        return _fallback(_fallback_reason(exc))
+    if shared:
+        MOTIVATION_STAMPEDE.labels("local").inc()
+    return message
+
+
+class MotivationChunk(NamedTuple):
+    text: str
+    cached: bool = False
+    fallback: bool = False
 
-    quote = await get_quote_for_current_hour(db, now=now, locale=locale)
 
+async def _stream_with_fallback(quote: IndexedQuote, user_name: str) -> AsyncIterator[MotivationChunk]:
+    """Stream fresh chunks; a failure before the first chunk yields the fallback instead."""
+    started = False
+    try:
+        async for chunk in _stream_model(quote, user_name):
+            started = True
+            yield MotivationChunk(chunk)
+    except Exception as exc:
+        reason = _fallback_reason(exc)
+        if not started:
+            yield MotivationChunk(_fallback(reason), fallback=True)
+        else:
+            # Part of the message is already on the wire; end the stream without caching it.
+            MOTIVATION_FALLBACK.labels(f"{reason}_partial").inc()
+            raise
+
+
+async def stream_motivation_for_quote(
+    quote: IndexedQuote | None,
+    user_name: str,
+    *,
+    locale: Optional[str] = None,
+    now: Optional[datetime] = None,
+    redis_conn: redis.Redis | None = None,
+) -> AsyncIterator[MotivationChunk]:
+    """Yield the message in chunks; cached messages and the fallback arrive as a single chunk."""
     if not quote:
-        return "Keep going. Small steps this hour become big wins tomorrow."
+        yield MotivationChunk(FALLBACK_MESSAGE, fallback=True)
+        return
+    if not settings.motivation.cache_enabled:
+        async for item in _stream_with_fallback(quote, user_name):
+            yield item
+        return
 
-    chain = prompt | model | parser
-    return await chain.ainvoke(
-        {
-            "user_name": user_name,
-            "quote_text": quote.text,
-            "quote_author": quote.author or "Unknown",
-        }
-    )
+    if now is None:
+        now = datetime.now(timezone.utc)
+    redis_conn = redis_conn or RedisClient.get_client()
+    hour_index = hour_index_for(now)
+
+    cached = await _cached_message(redis_conn, hour_index, locale, quote, user_name)
+    if cached is not None:
+        yield MotivationChunk(cached, cached=True)
+        return
+
+    chunks: list[str] = []
+    async for chunk in _stream_with_fallback(quote, user_name):
+        if chunk.fallback:
+            yield chunk
+            return
+        chunks.append(chunk.text)
+        yield chunk
+    if not chunks:
+        return
+    # Streams are not single-flighted; the first one to finish fills the cache for everyone else.
+    key = _cache_key(hour_index, locale, quote.id, user_name)
+    await redis_conn.set(key, "".join(chunks), ex=_seconds_to_hour_end(now), nx=True)
+
+
+async def pregenerate_hour(
+    hour_index: int,
+    *,
+    redis_conn: redis.Redis | None = None,
+    chat_model: "BaseChatModel | None" = None,
+) -> int:
+    """Generate one name-templated message per locale for ``hour_index``.
+
+    Covers every locale in the quote index plus the locale-less bucket, skips
+    keys that are already stored and returns how many templates were written.
+    """
+    redis_conn = redis_conn or RedisClient.get_client()
+    targets: list[tuple[str | None, IndexedQuote]] = []
+    for locale in [None, *quote_index.locales]:
+        quote = quote_index.pick(hour_index, locale)
+        if quote is not None:
+            targets.append((locale, quote))
+    if not targets:
+        return 0
+
+    keys = [_template_key(hour_index, locale, quote.id) for locale, quote in targets]
+    existing = await redis_conn.mget(keys)
+    pending = [(key, target) for key, target, found in zip(keys, targets, existing) if found is None]
+    if not pending:
+        return 0
+
+    # The batch goes through the same breaker as request-time calls unless it brings its own model.
+    guarded = chat_model is None
+    if guarded:
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            logger.info("Skipping motivation pre-generation for hour %s: model circuit is open", hour_index)
+            return 0
+    _, template_prompt, parser = _prompts()
+    chain = template_prompt | (chat_model or get_model()) | parser
+    try:
+        results = await chain.abatch(
+            [
+                {
+                    "quote_text": quote.text,
+                    "quote_author": quote.author or "Unknown",
+                    "locale": locale or "any",
+                }
+                for _, (locale, quote) in pending
+            ],
+            config={"max_concurrency": settings.motivation.pregen_concurrency},
+            return_exceptions=True,
+        )
+    except BaseException:
+        if guarded:
+            breaker.release()
+        raise
+    if guarded:
+        if any(isinstance(result, asyncio.CancelledError) for result in results):
+            breaker.release()
+        else:
+            for result in results:
+                if isinstance(result, Exception):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+    # Keep templates until the end of the target hour, plus the lead time they were written ahead of it.
+    ttl_s = 3600 + settings.motivation.pregen_lead_s
+    written = 0
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for (key, (locale, _)), result in zip(pending, results):
+            # abatch hands back a cancellation as a result; shutdown must still stop the scheduler.
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                logger.warning("Motivation pre-generation failed for locale %s: %s", locale or "*", result)
+                MOTIVATION_PREGENERATED.labels("error").inc()
+                continue
+            pipe.set(key, result.strip(), ex=ttl_s)
+            written += 1
+        await pipe.execute()
+    MOTIVATION_PREGENERATED.labels("ok").inc(written)
+    return written
+
+
+async def _pregenerate_once(hour_index: int, redis_conn: redis.Redis) -> None:
+    # One worker per hour does the batch; the rest read its results from Redis.
+    lock_key = f"{PREGEN_LOCK_PREFIX}{hour_index}"
+    if not await redis_conn.set(lock_key, "1", nx=True, ex=3600):
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await quote_index.ensure_fresh(db, redis_conn)
+        await pregenerate_hour(hour_index, redis_conn=redis_conn)
+    except Exception:
+        await redis_conn.delete(lock_key)
+        raise
+
+
+async def run_pregeneration_scheduler() -> None:
+    """Fill the current hour on start, then each next hour ``pregen_lead_s`` before it begins."""
+    redis_conn = RedisClient.get_client()
+    hour_index = hour_index_for(datetime.now(timezone.utc))
+    while True:
+        try:
+            await _pregenerate_once(hour_index, redis_conn)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Motivation pre-generation for hour %s failed", hour_index)
+
+        hour_index += 1
+        delay = hour_index * 3600 - settings.motivation.pregen_lead_s - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_scheduler: asyncio.Task | None = None
+
+
+def start_scheduler() -> None:
+    global _scheduler
+    if settings.motivation.pregen_enabled and _scheduler is None:
+        _scheduler = asyncio.create_task(run_pregeneration_scheduler())
+
+
+async def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.cancel()
+    try:
+        await _scheduler
+    except asyncio.CancelledError:
+        pass
+    _scheduler = None
+
+
+async def generate_hourly_motivation(
+    db: AsyncSession,
+    user_name: str,
+    locale: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> str:
+    if now is None:
+        now = datetime.now(timezone.utc)
+
+    quote = await get_quote_for_current_hour(db, now=now, locale=locale)
+    return await motivation_for_quote(quote, user_name, locale=locale, now=now)
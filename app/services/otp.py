@@ -42,7 +42,7 @@ async def start(redis_conn: redis.Redis, email: str) -> str:
     digest = hashlib.sha256(otp.encode()).hexdigest()
     await redis_conn.hset(key, mapping={"otp_hash": digest, "attempts": 0})
     await redis_conn.expire(key, OTP_TTL_SECONDS)
-    await email_service.send_mail(
+    await email_service.queue_mail(
         subject="Your password reset code",
         recipients=[email],
         body=f"<p>Your OTP code is <strong>{otp}</strong>. It expires in 10 minutes.</p>",
@@ -1,8 +1,26 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from argon2 import PasswordHasher
 
+from app.core.config import settings
+from app.core.metrics import (
+    PASSWORD_HASH_SECONDS,
+    PASSWORD_QUEUE_DEPTH,
+    PASSWORD_REJECTED,
+    PASSWORD_WAIT_SECONDS,
+)
+
 ph = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=2)
 
 
+class PasswordPoolSaturated(Exception):
+    pass
+
+
 def hash_password(password: str) -> str:
     return ph.hash(password)
 
@@ -12,3 +30,96 @@ def verify_password(password_hash: str, password: str) -> bool:
         return ph.verify(password_hash, password)
     except Exception:
         return False
+
+
+def _hash_job(password: str) -> tuple[str, float, float]:
+    started = time.time()
+    return hash_password(password), started, time.time() - started
+
+
+def _verify_job(password_hash: str, password: str) -> tuple[bool, float, float]:
+    started = time.time()
+    return verify_password(password_hash, password), started, time.time() - started
+
+
+_pool: ProcessPoolExecutor | None = None
+_pending = 0
+
+
+def _workers() -> int:
+    return settings.password_hash.workers or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=_workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def _submit(op: str, fn, *args):
+    global _pending
+    if _pending >= _workers() + settings.password_hash.max_queue:
+        PASSWORD_REJECTED.labels(op).inc()
+        raise PasswordPoolSaturated()
+    _pending += 1
+    PASSWORD_QUEUE_DEPTH.set(_pending)
+    submitted = time.time()
+    try:
+        result, started, elapsed = await asyncio.get_running_loop().run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+        PASSWORD_QUEUE_DEPTH.set(_pending)
+    PASSWORD_WAIT_SECONDS.labels(op).observe(max(started - submitted, 0.0))
+    PASSWORD_HASH_SECONDS.labels(op).observe(elapsed)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit("hash", _hash_job, password)
+
+
+async def verify_password_async(password_hash: str, password: str) -> bool:
+    return await _submit("verify", _verify_job, password_hash, password)
+
+
+async def hash_passwords_async(passwords: list[str], concurrency: int | None = None) -> list[str]:
+    """Hash a batch across the pool for bulk jobs.
+
+    Bypasses the saturation check used by request handlers but keeps at most
+    ``concurrency`` jobs in flight so interactive sign-ins still get workers.
+    """
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    gate = asyncio.Semaphore(concurrency or _workers())
+
+    async def _one(password: str) -> str:
+        async with gate:
+            result, _, elapsed = await loop.run_in_executor(pool, _hash_job, password)
+        PASSWORD_HASH_SECONDS.labels("hash").observe(elapsed)
+        return result
+
+    return await asyncio.gather(*map(_one, passwords))
+
+
+def _warm_job() -> int:
+    return os.getpid()
+
+
+async def warm_pool() -> None:
+    """Spawn every pool worker now; with the spawn start method each one otherwise starts on first use."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, _warm_job) for _ in range(_workers())))
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
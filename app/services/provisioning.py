@@ -0,0 +1,238 @@
+import csv
+import json
+import logging
+import tempfile
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import IO
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import PROVISIONED_USERS
+from app.models.audit import AuthAudit
+from app.models.types import uuid7_str
+from app.models.user import User
+from app.schemas.admin import ProvisionResult, ProvisionUserIn
+from app.services import password as password_service
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+
+# Not a valid Argon2 hash, so sign-in always fails until the user resets
+# their password through the OTP flow.
+UNUSABLE_PASSWORD = "!"
+
+_TRUE = {"1", "true", "yes", "y"}
+
+
+async def spool(chunks: AsyncIterable[bytes], max_memory: int) -> IO[bytes]:
+    """Copy a byte stream into a rewound temporary file, kept in memory up to ``max_memory`` bytes.
+
+    The bulk endpoint reads the whole upload before it starts responding:
+    once a streaming response is running, the server's disconnect listener
+    competes for the remaining request body chunks.
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        async for chunk in chunks:
+            file.write(chunk)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+async def iter_file(file: IO[bytes], chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream (e.g. ``request.stream()``) into decoded lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yield ``(line, fields, error)`` per data row; the first line is the header.
+
+    Rows are parsed one line at a time, so quoted fields cannot span lines.
+    """
+    header: list[str] | None = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as exc:
+            yield number, None, str(exc)
+            continue
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        if len(values) != len(header):
+            yield number, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        row = {key: value for key, value in zip(header, values) if value != ""}
+        if "email_verified" in row:
+            row["email_verified"] = row["email_verified"].strip().lower() in _TRUE
+        yield number, row, None
+
+
+async def parse_jsonl(lines: AsyncIterable[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield number, None, str(exc)
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "expected a JSON object"
+            continue
+        yield number, row, None
+
+
+PARSERS = {FORMAT_CSV: parse_csv, FORMAT_JSONL: parse_jsonl}
+
+
+async def _existing_emails(db: AsyncSession, emails: list[str]) -> set[str]:
+    result = await db.execute(select(User.email).where(User.email.in_(emails)))
+    return {email.lower() for email in result.scalars()}
+
+
+async def _provision_chunk(
+    db: AsyncSession, chunk: list[tuple[int, ProvisionUserIn]], hash_concurrency: int | None
+) -> list[ProvisionResult]:
+    results: dict[int, ProvisionResult] = {}
+    pending: list[tuple[int, ProvisionUserIn]] = []
+    seen: set[str] = set()
+    for line, user in chunk:
+        key = user.email.lower()
+        if key in seen:
+            results[line] = ProvisionResult(line=line, email=user.email, status="duplicate")
+        else:
+            seen.add(key)
+            pending.append((line, user))
+
+    async with db.begin():
+        existing = await _existing_emails(db, [user.email for _, user in pending])
+    to_create = []
+    for line, user in pending:
+        if user.email.lower() in existing:
+            results[line] = ProvisionResult(line=line, email=user.email, status="exists")
+        else:
+            to_create.append((line, user))
+
+    passwords = [user.password for _, user in to_create if user.password]
+    hashes = iter(await password_service.hash_passwords_async(passwords, hash_concurrency))
+    rows = [
+        {
+            "id": uuid7_str(),
+            "email": user.email,
+            "password_hash": next(hashes) if user.password else UNUSABLE_PASSWORD,
+            "name": user.name,
+            "tz": user.tz,
+            "locale": user.locale,
+            "email_verified": user.email_verified,
+        }
+        for _, user in to_create
+    ]
+
+    # The email lookup and the insert are separate transactions so no locks
+    # are held while hashing. A signup that lands in between fails the whole
+    # chunk; look the emails up again and insert the rest. Any other
+    # constraint failure marks the chunk's new rows as errors: the response
+    # is already streaming, so raising would only truncate it.
+    while rows:
+        try:
+            async with db.begin():
+                await db.execute(insert(User).values(rows))
+                await db.execute(
+                    insert(AuthAudit).values(
+                        [{"id": uuid7_str(), "user_id": row["id"], "event": "provision"} for row in rows]
+                    )
+                )
+            break
+        except IntegrityError as exc:
+            async with db.begin():
+                raced = await _existing_emails(db, [row["email"] for row in rows])
+            if not raced:
+                logger.warning("Bulk provisioning chunk rejected: %s", exc.orig)
+                for line, user in to_create:
+                    results[line] = ProvisionResult(
+                        line=line, email=user.email, status="error", error=f"insert rejected: {exc.orig}"
+                    )
+                return [results[line] for line, _ in chunk]
+            for line, user in to_create:
+                if user.email.lower() in raced:
+                    results[line] = ProvisionResult(line=line, email=user.email, status="exists")
+            kept = [(item, row) for item, row in zip(to_create, rows) if row["email"].lower() not in raced]
+            to_create = [item for item, _ in kept]
+            rows = [row for _, row in kept]
+
+    for (line, user), row in zip(to_create, rows):
+        results[line] = ProvisionResult(line=line, email=user.email, status="created", id=row["id"])
+    return [results[line] for line, _ in chunk]
+
+
+async def provision(
+    db: AsyncSession,
+    rows: AsyncIterable[tuple[int, dict | None, str | None]],
+    *,
+    chunk_size: int | None = None,
+    hash_concurrency: int | None = None,
+) -> AsyncIterator[ProvisionResult]:
+    """Create users from parsed rows, yielding one result per input row.
+
+    Each chunk costs one ``SELECT ... IN`` for existing emails, parallel
+    Argon2 hashing, and one multi-row INSERT each for ``users`` and
+    ``auth_audit``. Rows without a password get an unusable hash and must go
+    through password reset before they can sign in.
+    """
+    chunk_size = chunk_size or settings.provisioning.chunk_size
+    hash_concurrency = hash_concurrency or settings.provisioning.hash_concurrency
+    chunk: list[tuple[int, ProvisionUserIn]] = []
+    invalid: list[ProvisionResult] = []
+
+    async def flush() -> list[ProvisionResult]:
+        done = invalid + (await _provision_chunk(db, chunk, hash_concurrency) if chunk else [])
+        chunk.clear()
+        invalid.clear()
+        for result in done:
+            PROVISIONED_USERS.labels(result.status).inc()
+        return sorted(done, key=lambda result: result.line)
+
+    async for line, fields, error in rows:
+        if error is None:
+            try:
+                chunk.append((line, ProvisionUserIn.model_validate(fields)))
+            except ValidationError as exc:
+                error = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors())
+        if error is not None:
+            email = fields.get("email") if isinstance(fields, dict) else None
+            invalid.append(
+                ProvisionResult(line=line, email=str(email) if email else None, status="invalid", error=error)
+            )
+        if len(chunk) + len(invalid) >= chunk_size:
+            for result in await flush():
+                yield result
+    for result in await flush():
+        yield result
@@ -1,35 +1,126 @@
+import asyncio
+import bisect
+import time
 from datetime import datetime, timezone
-from typing import Optional
+from typing import NamedTuple, Optional
 
-from sqlalchemy import func, select
+import redis.asyncio as redis
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.redis import RedisClient
 from app.models.quote import Quote
 
+QUOTE_VERSION_KEY = "quotes:version"
+
+# Ids below the high-water mark that are re-read on each refresh, so a row whose
+# transaction committed after a higher id was already indexed is still picked up.
+REREAD_WINDOW = 100
+
+
+class IndexedQuote(NamedTuple):
+    id: int
+    text: str
+    author: str | None
+    locale: str
+
+
+class QuoteIndex:
+    """Per-locale quotes ordered by id, held in worker memory.
+
+    The ``None`` bucket holds every quote and serves requests without a locale.
+    New ids are merged in incrementally; edits and deletes need a version bump.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: dict[str | None, list[IndexedQuote]] = {}
+        self._ids: set[int] = set()
+        self._max_id = 0
+        self._version: str | None = None
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def locales(self) -> list[str]:
+        return [locale for locale in self._buckets if locale is not None]
+
+    def _merge(self, rows) -> None:
+        for row in rows:
+            if row.id in self._ids:
+                continue
+            quote = IndexedQuote(row.id, row.text, row.author, row.locale)
+            for bucket in (self._buckets.setdefault(None, []), self._buckets.setdefault(quote.locale, [])):
+                if bucket and bucket[-1].id > quote.id:
+                    bisect.insort(bucket, quote, key=lambda indexed: indexed.id)
+                else:
+                    bucket.append(quote)
+            self._ids.add(quote.id)
+            self._max_id = max(self._max_id, quote.id)
+
+    async def _fetch(self, db: AsyncSession, after_id: int):
+        stmt = (
+            select(Quote.id, Quote.text, Quote.author, Quote.locale)
+            .where(Quote.id > after_id)
+            .order_by(Quote.id)
+        )
+        if db.in_transaction():
+            return (await db.execute(stmt)).all()
+        # A transaction of our own, so the connection goes back to the pool
+        # before the caller moves on (to a model call, say).
+        async with db.begin():
+            return (await db.execute(stmt)).all()
+
+    async def load(self, db: AsyncSession, redis_conn: redis.Redis | None = None) -> None:
+        redis_conn = redis_conn or RedisClient.get_client()
+        version = await redis_conn.get(QUOTE_VERSION_KEY)
+        rows = await self._fetch(db, 0)
+        self._buckets = {}
+        self._ids = set()
+        self._max_id = 0
+        self._merge(rows)
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    async def ensure_fresh(self, db: AsyncSession, redis_conn: redis.Redis | None = None) -> None:
+        if self._checked_at is not None and time.monotonic() - self._checked_at < settings.quote_index_refresh_s:
+            return
+        async with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < settings.quote_index_refresh_s:
+                return
+            redis_conn = redis_conn or RedisClient.get_client()
+            if self._checked_at is None or await redis_conn.get(QUOTE_VERSION_KEY) != self._version:
+                await self.load(db, redis_conn)
+                return
+            self._merge(await self._fetch(db, max(self._max_id - REREAD_WINDOW, 0)))
+            self._checked_at = time.monotonic()
+
+    def pick(self, hour_index: int, locale: str | None = None) -> IndexedQuote | None:
+        bucket = self._buckets.get(locale or None)
+        if not bucket:
+            return None
+        return bucket[hour_index % len(bucket)]
+
+
+quote_index = QuoteIndex()
+
+
+def hour_index_for(now: datetime) -> int:
+    return int(now.timestamp() // 3600)
+
+
+async def bump_version(redis_conn: redis.Redis) -> None:
+    await redis_conn.incr(QUOTE_VERSION_KEY)
+
 
 async def get_quote_for_current_hour(
     db: AsyncSession,
     now: Optional[datetime] = None,
     locale: Optional[str] = None,
-) -> Optional[Quote]:
+) -> Optional[IndexedQuote]:
     """Return the deterministic quote for the current UTC hour."""
     if now is None:
         now = datetime.now(timezone.utc)
 
-    base_stmt = select(Quote)
-    if locale:
-        base_stmt = base_stmt.where(Quote.locale == locale)
-
-    count_stmt = select(func.count()).select_from(base_stmt.subquery())
-    result = await db.execute(count_stmt)
-    count = result.scalar_one()
-
-    if count == 0:
-        return None
-
-    hour_index = int(now.timestamp() // 3600)
-    offset = hour_index % count
-
-    stmt = base_stmt.order_by(Quote.id).offset(offset).limit(1)
-    res = await db.execute(stmt)
-    return res.scalar_one_or_none()
+    await quote_index.ensure_fresh(db)
+    return quote_index.pick(hour_index_for(now), locale)
@@ -0,0 +1,136 @@
+import hashlib
+import math
+from typing import Awaitable, Callable
+
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.core.config import RateLimitRule
+from app.core.redis import LuaScript, get_redis
+from app.utils.request import client_ip
+
+RATE_LIMIT_PREFIX = "rl:"
+
+# GCRA over several keys at once: a request is admitted only if every key admits it,
+# and only then are the theoretical arrival times (TAT) advanced. Times are in ms.
+GCRA_LUA = """
+local function gcra(keys, rules)
+  if redis.replicate_commands then
+    redis.replicate_commands()
+  end
+  local t = redis.call('TIME')
+  local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+  local allowed, retry_after, remaining, reset, limit = 1, 0, -1, 0, 0
+  local tats = {}
+  for i, key in ipairs(keys) do
+    local period = tonumber(rules[i][1])
+    local cap = tonumber(rules[i][2])
+    local interval = period / cap
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then
+      tat = now
+    end
+    local new_tat = tat + interval
+    local over = new_tat - now - period
+    local left, reset_i
+    if over > 0 then
+      allowed = 0
+      retry_after = math.max(retry_after, over)
+      left = 0
+      reset_i = tat - now
+    else
+      left = math.floor((period - (new_tat - now)) / interval)
+      reset_i = new_tat - now
+    end
+    tats[i] = new_tat
+    if remaining < 0 or left < remaining then
+      remaining = left
+      limit = cap
+    end
+    reset = math.max(reset, reset_i)
+  end
+  if allowed == 1 then
+    for i, key in ipairs(keys) do
+      redis.call('SET', key, tostring(tats[i]), 'PX', math.ceil(tats[i] - now))
+    end
+  end
+  return {allowed, math.ceil(retry_after), remaining, math.ceil(reset), limit}
+end
+"""
+
+# KEYS: one bucket per rule; ARGV: period_ms, limit for each rule in KEYS order
+_RATE_LIMIT = LuaScript(
+    GCRA_LUA
+    + """
+local rules = {}
+for i = 1, #KEYS do
+  rules[i] = {ARGV[2 * i - 1], ARGV[2 * i]}
+end
+return gcra(KEYS, rules)
+"""
+)
+
+KeyFunc = Callable[[Request], Awaitable[str | None]]
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.strip().lower().encode()).hexdigest()
+
+
+def body_field(field: str) -> KeyFunc:
+    async def extract(request: Request) -> str | None:
+        try:
+            data = await request.json()
+        except Exception:
+            return None
+        value = data.get(field) if isinstance(data, dict) else None
+        return str(value) if value else None
+
+    return extract
+
+
+def headers_for(remaining: int, reset_ms: int, limit: int) -> dict[str, str]:
+    return {
+        "RateLimit-Limit": str(limit),
+        "RateLimit-Remaining": str(max(remaining, 0)),
+        "RateLimit-Reset": str(math.ceil(reset_ms / 1000)),
+    }
+
+
+def too_many_requests(retry_ms: int, remaining: int, reset_ms: int, limit: int) -> HTTPException:
+    headers = headers_for(remaining, reset_ms, limit)
+    headers["Retry-After"] = str(max(math.ceil(retry_ms / 1000), 1))
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Slow down", headers=headers)
+
+
+def rate_limit(
+    name: str,
+    *,
+    per_ip: RateLimitRule | None = None,
+    per_key: RateLimitRule | None = None,
+    key: KeyFunc | None = None,
+):
+    async def dependency(
+        request: Request,
+        response: Response,
+        redis_conn: redis.Redis = Depends(get_redis),
+    ) -> None:
+        keys: list[str] = []
+        args: list[int] = []
+        if per_ip:
+            keys.append(f"{RATE_LIMIT_PREFIX}{name}:ip:{_digest(client_ip(request) or 'unknown')}")
+            args += [per_ip.period_s * 1000, per_ip.limit]
+        if per_key and key:
+            value = await key(request)
+            if value:
+                keys.append(f"{RATE_LIMIT_PREFIX}{name}:key:{_digest(value)}")
+                args += [per_key.period_s * 1000, per_key.limit]
+        if not keys:
+            return
+
+        allowed, retry_ms, remaining, reset_ms, limit = await _RATE_LIMIT(redis_conn, keys, args)
+        if not allowed:
+            raise too_many_requests(retry_ms, remaining, reset_ms, limit)
+        response.headers.update(headers_for(remaining, reset_ms, limit))
+
+    return dependency
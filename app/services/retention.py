@@ -0,0 +1,212 @@
+import asyncio
+import datetime as dt
+import logging
+import time
+
+import redis.asyncio as redis
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import RETENTION_BATCH_SECONDS, RETENTION_DELETED, RETENTION_LAST_RUN
+from app.core.redis import RedisClient
+from app.models.audit import AuthAudit
+from app.models.session import Session
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LOCK_KEY = "retention:sweep"
+AUDIT_TABLE = AuthAudit.__tablename__
+
+
+async def _delete_in_batches(db: AsyncSession, label: str, model, order_col, *conditions) -> int:
+    """Delete rows matching ``conditions`` oldest-first, ``batch_size`` at a time.
+
+    Each batch is its own short transaction on the ``order_col`` index, with
+    a pause in between so replicas and concurrent writers keep up.
+    """
+    total = 0
+    while True:
+        started = time.perf_counter()
+        async with db.begin():
+            stmt = select(model.id).where(*conditions).order_by(order_col, model.id)
+            ids = (await db.execute(stmt.limit(settings.retention.batch_size))).scalars().all()
+            if ids:
+                stmt = delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+                await db.execute(stmt)
+        RETENTION_BATCH_SECONDS.labels(label).observe(time.perf_counter() - started)
+        if not ids:
+            break
+        total += len(ids)
+        RETENTION_DELETED.labels(label).inc(len(ids))
+        if len(ids) < settings.retention.batch_size:
+            break
+        await asyncio.sleep(settings.retention.batch_sleep_ms / 1000)
+    RETENTION_LAST_RUN.labels(label).set(time.time())
+    return total
+
+
+async def purge_sessions(db: AsyncSession, now: dt.datetime | None = None) -> int:
+    now = now or dt.datetime.utcnow()
+    expired = await _delete_in_batches(
+        db,
+        "sessions_expired",
+        Session,
+        Session.expires_at,
+        Session.expires_at < now - dt.timedelta(days=settings.retention.expired_session_days),
+    )
+    revoked = await _delete_in_batches(
+        db,
+        "sessions_revoked",
+        Session,
+        Session.revoked_at,
+        Session.revoked_at < now - dt.timedelta(days=settings.retention.revoked_session_days),
+    )
+    return expired + revoked
+
+
+async def purge_audit(db: AsyncSession, now: dt.datetime | None = None) -> int:
+    now = now or dt.datetime.utcnow()
+    cutoff = now - dt.timedelta(days=settings.retention.audit_days)
+    if settings.retention.audit_partitioned:
+        return await drop_audit_partitions(db, cutoff)
+    return await _delete_in_batches(db, "auth_audit", AuthAudit, AuthAudit.created_at, AuthAudit.created_at < cutoff)
+
+
+def _month_start(value: dt.datetime | dt.date, offset: int = 0) -> dt.date:
+    month = value.year * 12 + value.month - 1 + offset
+    return dt.date(month // 12, month % 12 + 1, 1)
+
+
+def _partition_name(upper_bound: dt.date) -> str:
+    # Named after the month the partition holds, i.e. the month before its upper bound.
+    return "p" + _month_start(upper_bound, -1).strftime("%Y%m")
+
+
+def _partition_clause(bound: dt.date) -> str:
+    return f"PARTITION {_partition_name(bound)} VALUES LESS THAN ('{bound.isoformat()}')"
+
+
+async def partition_audit_table(db: AsyncSession, now: dt.datetime | None = None) -> None:
+    """One-off conversion of ``auth_audit`` to monthly RANGE COLUMNS partitions.
+
+    MySQL requires the partition column in every unique key, so the primary
+    key becomes ``(id, created_at)``. This rewrites the table; run it from the
+    CLI in a maintenance window, then set ``retention.audit_partitioned``.
+    """
+    now = now or dt.datetime.utcnow()
+    async with db.begin():
+        oldest = (await db.execute(select(AuthAudit.created_at).order_by(AuthAudit.created_at).limit(1))).scalar()
+    start = _month_start(oldest or now, 1)
+    end = _month_start(now, settings.retention.audit_partition_months_ahead + 1)
+    bounds = []
+    while start <= end:
+        bounds.append(start)
+        start = _month_start(start, 1)
+    partitions = ",\n  ".join([*map(_partition_clause, bounds), "PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+    async with db.begin():
+        await db.execute(text(f"ALTER TABLE {AUDIT_TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"))
+        await db.execute(text(f"ALTER TABLE {AUDIT_TABLE} PARTITION BY RANGE COLUMNS(created_at) (\n  {partitions}\n)"))
+
+
+async def _audit_partitions(db: AsyncSession) -> list[tuple[str, str]]:
+    rows = await db.execute(
+        text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": AUDIT_TABLE},
+    )
+    return [(name, description.strip("'")) for name, description in rows.all()]
+
+
+async def ensure_audit_partitions(db: AsyncSession, now: dt.datetime | None = None) -> None:
+    """Split ``pmax`` so monthly partitions exist ``audit_partition_months_ahead`` into the future."""
+    now = now or dt.datetime.utcnow()
+    async with db.begin():
+        partitions = await _audit_partitions(db)
+    bounded = [dt.date.fromisoformat(bound[:10]) for name, bound in partitions if name != "pmax"]
+    if not bounded:
+        return
+    want = _month_start(now, settings.retention.audit_partition_months_ahead + 1)
+    bounds = []
+    bound = _month_start(max(bounded), 1)
+    while bound <= want:
+        bounds.append(bound)
+        bound = _month_start(bound, 1)
+    if not bounds:
+        return
+    clauses = ", ".join([*map(_partition_clause, bounds), "PARTITION pmax VALUES LESS THAN (MAXVALUE)"])
+    async with db.begin():
+        await db.execute(text(f"ALTER TABLE {AUDIT_TABLE} REORGANIZE PARTITION pmax INTO ({clauses})"))
+
+
+async def drop_audit_partitions(db: AsyncSession, cutoff: dt.datetime) -> int:
+    """Drop whole monthly partitions whose every row is older than ``cutoff``."""
+    async with db.begin():
+        partitions = await _audit_partitions(db)
+    expired = [
+        name
+        for name, bound in partitions
+        if name != "pmax" and dt.date.fromisoformat(bound[:10]) <= cutoff.date()
+    ]
+    if expired:
+        async with db.begin():
+            await db.execute(text(f"ALTER TABLE {AUDIT_TABLE} DROP PARTITION {', '.join(expired)}"))
+        RETENTION_DELETED.labels("auth_audit_partitions").inc(len(expired))
+    RETENTION_LAST_RUN.labels("auth_audit").set(time.time())
+    return len(expired)
+
+
+async def sweep(db: AsyncSession) -> dict[str, int]:
+    result = {
+        "sessions": await purge_sessions(db),
+        "auth_audit": await purge_audit(db),
+    }
+    if settings.retention.audit_partitioned:
+        await ensure_audit_partitions(db)
+    return result
+
+
+async def _sweep_once(redis_conn: redis.Redis) -> None:
+    # One worker per interval sweeps; the lock outlives the run so the others skip this round.
+    if not await redis_conn.set(SWEEP_LOCK_KEY, "1", nx=True, ex=settings.retention.interval_s):
+        return
+    async with AsyncSessionLocal() as db:
+        result = await sweep(db)
+    logger.info("Retention sweep finished: %s", result)
+
+
+async def run_sweeper() -> None:
+    redis_conn = RedisClient.get_client()
+    while True:
+        try:
+            await _sweep_once(redis_conn)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Retention sweep failed")
+        await asyncio.sleep(settings.retention.interval_s)
+
+
+_sweeper: asyncio.Task | None = None
+
+
+def start_sweeper() -> None:
+    global _sweeper
+    if settings.retention.enabled and _sweeper is None:
+        _sweeper = asyncio.create_task(run_sweeper())
+
+
+async def stop_sweeper() -> None:
+    global _sweeper
+    if _sweeper is None:
+        return
+    _sweeper.cancel()
+    try:
+        await _sweeper
+    except asyncio.CancelledError:
+        pass
+    _sweeper = None
@@ -1,8 +1,11 @@
 import hashlib
+from typing import NamedTuple
 
 import redis.asyncio as redis
 
 from app.core.config import settings
+from app.core.redis import INVALIDATION_CHANNEL, LuaScript, local_cache, publish_invalidation
+from app.services.ratelimit import GCRA_LUA
 
 LOCK_PREFIX = "auth:lock:"
 IP_COUNTER_PREFIX = "auth:ip:"
@@ -10,6 +13,61 @@ EMAIL_COUNTER_PREFIX = "auth:email:"
 FAMILY_REVOKE_PREFIX = "auth:revoke:"
 FAIL_COUNTER_PREFIX = "auth:fail:"
 
+local_cache.track(LOCK_PREFIX, FAMILY_REVOKE_PREFIX)
+
+VERDICT_OK = "ok"
+VERDICT_LOCKED = "locked"
+VERDICT_RATE_LIMITED = "rate_limited"
+
+# KEYS: lock, ip bucket, email bucket
+# ARGV: ip window, ip max, email window, email max
+# Returns the verdict followed by the GCRA retry-after, remaining, reset (ms) and limit.
+_SIGNIN_CHECK = LuaScript(
+    GCRA_LUA
+    + """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return {'locked', 0, 0, 0, 0}
+end
+local verdict = gcra(
+  {KEYS[2], KEYS[3]},
+  {{tonumber(ARGV[1]) * 1000, ARGV[2]}, {tonumber(ARGV[3]) * 1000, ARGV[4]}}
+)
+local status = 'ok'
+if verdict[1] == 0 then
+  status = 'rate_limited'
+end
+return {status, verdict[2], verdict[3], verdict[4], verdict[5]}
+"""
+)
+
+# KEYS: fail counter, lock
+# ARGV: fail window, max fails, lock ttl, captcha threshold, invalidation channel
+_SIGNIN_FAIL = LuaScript(
+    """
+local fails = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+local locked = 0
+if fails >= tonumber(ARGV[2]) then
+  redis.call('SET', KEYS[2], 1, 'EX', ARGV[3])
+  redis.call('PUBLISH', ARGV[5], KEYS[2])
+  locked = 1
+end
+local captcha = 0
+if fails >= tonumber(ARGV[4]) then
+  captcha = 1
+end
+return {locked, captcha}
+"""
+)
+
+
+class SigninVerdict(NamedTuple):
+    status: str
+    retry_after_ms: int
+    remaining: int
+    reset_ms: int
+    limit: int
+
 
 def _hash_ip(ip: str | None) -> str:
     if not ip:
@@ -41,37 +99,41 @@ def family_revoke_key(family_id: str) -> str:
     return f"{FAMILY_REVOKE_PREFIX}{family_id}"
 
 
-async def hit_signin(redis_conn: redis.Redis, email: str, ip: str | None) -> tuple[int, int]:
-    hashed_ip = _hash_ip(ip)
-    ip_key = _ip_key(hashed_ip)
-    ip_count = await redis_conn.incr(ip_key)
-    await redis_conn.expire(ip_key, settings.rate_limit.signin_ip_window_s)
-
-    email_key = _email_counter_key(email)
-    email_count = await redis_conn.incr(email_key)
-    await redis_conn.expire(
-        email_key, settings.rate_limit.signin_email_window_s
+async def check_signin(redis_conn: redis.Redis, email: str, ip: str | None) -> SigninVerdict:
+    status, retry_after_ms, remaining, reset_ms, limit = await _SIGNIN_CHECK(
+        redis_conn,
+        [_lock_key(email), _ip_key(_hash_ip(ip)), _email_counter_key(email)],
+        [
+            settings.rate_limit.signin_ip_window_s,
+            settings.rate_limit.signin_ip_max,
+            settings.rate_limit.signin_email_window_s,
+            settings.rate_limit.signin_email_max,
+        ],
     )
-    return ip_count, email_count
-
-
-async def after_fail(redis_conn: redis.Redis, email: str) -> bool:
-    fails = await redis_conn.incr(_fail_key(email))
-    await redis_conn.expire(
-        _fail_key(email), settings.rate_limit.signin_email_window_s
+    return SigninVerdict(status, int(retry_after_ms), int(remaining), int(reset_ms), int(limit))
+
+
+async def record_signin_failure(redis_conn: redis.Redis, email: str) -> tuple[bool, bool]:
+    locked, captcha = await _SIGNIN_FAIL(
+        redis_conn,
+        [_fail_key(email), _lock_key(email)],
+        [
+            settings.rate_limit.signin_email_window_s,
+            settings.rate_limit.signin_email_max,
+            settings.rate_limit.lock_minutes * 60,
+            settings.rate_limit.captcha_hint_after,
+            INVALIDATION_CHANNEL,
+        ],
     )
-    if fails >= settings.rate_limit.signin_email_max:
-        await lock(redis_conn, email, settings.rate_limit.lock_minutes * 60)
-        return True
-    return False
+    return bool(locked), bool(captcha)
 
 
 async def reset_fail(redis_conn: redis.Redis, email: str) -> None:
     await redis_conn.delete(_fail_key(email))
 
 
-async def is_locked(redis_conn: redis.Redis, email: str) -> bool:
-    ttl = await redis_conn.ttl(_lock_key(email))
+async def _lock_ttl(redis_conn: redis.Redis, key: str) -> bool:
+    ttl = await redis_conn.ttl(key)
     if ttl is None:
         return False
     if ttl == -2:
@@ -79,27 +141,38 @@ async def is_locked(redis_conn: redis.Redis, email: str) -> bool:
     return ttl == -1 or ttl > 0
 
 
+async def is_locked(redis_conn: redis.Redis, email: str) -> bool:
+    key = _lock_key(email)
+    return await local_cache.get(key, lambda: _lock_ttl(redis_conn, key), cache_if=lambda locked: not locked)
+
+
 async def lock(redis_conn: redis.Redis, email: str, ttl_s: int) -> None:
-    await redis_conn.set(_lock_key(email), 1, ex=ttl_s)
+    key = _lock_key(email)
+    await redis_conn.set(key, 1, ex=ttl_s)
+    await publish_invalidation(redis_conn, key)
 
 
-async def captcha_hint(redis_conn: redis.Redis, email: str) -> bool:
-    count = await redis_conn.get(_fail_key(email))
-    if not count:
-        return False
-    return int(count) >= settings.rate_limit.captcha_hint_after
+async def revoke_family(redis_conn: redis.Redis, family_id: str, ttl_seconds: int) -> None:
+    key = family_revoke_key(family_id)
+    await redis_conn.set(key, 1, ex=ttl_seconds)
+    await publish_invalidation(redis_conn, key)
 
 
-def is_rate_limited(ip_count: int, email_count: int) -> bool:
-    return (
-        ip_count > settings.rate_limit.signin_ip_max
-        or email_count > settings.rate_limit.signin_email_max
-    )
+async def revoke_families(redis_conn: redis.Redis, family_ids: list[str], ttl_seconds: int) -> None:
+    if not family_ids:
+        return
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for family_id in family_ids:
+            key = family_revoke_key(family_id)
+            pipe.set(key, 1, ex=ttl_seconds)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+        await pipe.execute()
 
 
-async def revoke_family(redis_conn: redis.Redis, family_id: str, ttl_seconds: int) -> None:
-    await redis_conn.set(family_revoke_key(family_id), 1, ex=ttl_seconds)
+async def _exists(redis_conn: redis.Redis, key: str) -> bool:
+    return bool(await redis_conn.exists(key))
 
 
 async def is_family_revoked(redis_conn: redis.Redis, family_id: str) -> bool:
-    return bool(await redis_conn.exists(family_revoke_key(family_id)))
+    key = family_revoke_key(family_id)
+    return await local_cache.get(key, lambda: _exists(redis_conn, key), cache_if=lambda revoked: not revoked)
@@ -1,7 +1,7 @@
 import datetime as dt
 import hashlib
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.session import Session
@@ -40,6 +40,12 @@ async def get_session_by_jti(db: AsyncSession, jti: str) -> Session | None:
     return result.scalar_one_or_none()
 
 
+async def lock_session(db: AsyncSession, jti: str) -> Session | None:
+    """Fetch the session for ``jti`` and lock its row for the rest of the transaction."""
+    result = await db.execute(select(Session).where(Session.jti == jti).with_for_update())
+    return result.scalar_one_or_none()
+
+
 async def rotate_session(
     db: AsyncSession,
     *,
@@ -62,3 +68,32 @@ async def mark_revoked(db: AsyncSession, session: Session) -> None:
 
 async def revoke_family(redis_conn, family_id: str, refresh_ttl_days: int) -> None:
     await risk.revoke_family(redis_conn, family_id, refresh_ttl_days * 24 * 3600)
+
+
+async def revoke_family_bulk(redis_conn, family_ids: list[str], refresh_ttl_days: int) -> None:
+    await risk.revoke_families(redis_conn, family_ids, refresh_ttl_days * 24 * 3600)
+
+
+async def revoke_all_for_user(db: AsyncSession, redis_conn, user_id: str, refresh_ttl_days: int) -> list[str]:
+    """Revoke every live session of ``user_id`` with one UPDATE and one Redis pipeline.
+
+    Returns the revoked family ids. Opens its own transaction.
+    """
+    async with db.begin():
+        family_ids = (
+            await db.execute(
+                select(Session.family_id)
+                .where(Session.user_id == user_id, Session.revoked_at.is_(None))
+                .with_for_update()
+            )
+        ).scalars().all()
+        if family_ids:
+            await db.execute(
+                update(Session)
+                .where(Session.user_id == user_id, Session.revoked_at.is_(None))
+                .values(revoked_at=dt.datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+    family_ids = list(dict.fromkeys(family_ids))
+    await revoke_family_bulk(redis_conn, family_ids, refresh_ttl_days)
+    return family_ids
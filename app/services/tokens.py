@@ -1,10 +1,14 @@
 import datetime as dt
+import time
 import uuid
-from typing import Tuple
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
 
 import jwt
 
 from app.core.config import settings
+from app.core.metrics import ACCESS_TOKEN_CACHE
+from app.models.types import uuid7_str
 
 ACCESS_MIN = settings.access_token_minutes
 REFRESH_DAYS = settings.refresh_token_days
@@ -25,7 +29,7 @@ def issue_access(user_id: str, session_jti: str) -> str:
 
 def issue_refresh(user_id: str, family_id: str, idx: int) -> Tuple[str, str, int, str]:
     now = dt.datetime.utcnow()
-    jti = str(uuid.uuid4())
+    jti = uuid7_str()
     payload = {
         "sub": user_id,
         "jti": jti,
@@ -40,3 +44,65 @@ def issue_refresh(user_id: str, family_id: str, idx: int) -> Tuple[str, str, int
 
 def decode_refresh(token: str) -> dict:
     return jwt.decode(token, settings.jwt_secret, algorithms=["HS256"], issuer=settings.jwt_iss)
+
+
+class AccessClaims(NamedTuple):
+    sub: str
+    sid: str
+    jti: str
+    exp: int
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of access tokens whose signature and claims already checked out.
+
+    Entries are dropped once the token's own ``exp`` passes, so a hit is as
+    good as a fresh decode.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, AccessClaims] = OrderedDict()
+
+    def get(self, token: str) -> AccessClaims | None:
+        claims = self._entries.get(token)
+        if claims is None:
+            return None
+        if claims.exp <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return claims
+
+    def put(self, token: str, claims: AccessClaims) -> None:
+        self._entries[token] = claims
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+access_cache = VerifiedTokenCache(settings.access_token_cache_size)
+
+
+def decode_access(token: str) -> AccessClaims:
+    if settings.access_token_cache_size > 0:
+        claims = access_cache.get(token)
+        if claims is not None:
+            ACCESS_TOKEN_CACHE.labels("hit").inc()
+            return claims
+        ACCESS_TOKEN_CACHE.labels("miss").inc()
+
+    payload = jwt.decode(
+        token,
+        settings.jwt_secret,
+        algorithms=["HS256"],
+        issuer=settings.jwt_iss,
+        options={"require": ["exp", "sub", "sid", "jti"]},
+    )
+    claims = AccessClaims(payload["sub"], payload["sid"], payload["jti"], int(payload["exp"]))
+    if settings.access_token_cache_size > 0:
+        access_cache.put(token, claims)
+    return claims
@@ -0,0 +1,111 @@
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import PRIMARY
+from app.core.metrics import USER_CACHE
+from app.core.redis import INVALIDATION_CHANNEL, LuaScript, local_cache
+from app.models.user import User
+from app.schemas.auth import UserPublic
+
+USER_CACHE_PREFIX = "user:profile:"
+USER_VERSION_PREFIX = "user:ver:"
+
+local_cache.track(USER_CACHE_PREFIX)
+
+# KEYS: profile, version; ARGV: version seen before the DB read, profile json, ttl.
+# A fill that raced with an invalidation sees a newer version and is discarded.
+_FILL = LuaScript(
+    """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+)
+
+# KEYS: profile, version; ARGV: invalidation channel
+_INVALIDATE = LuaScript(
+    """
+redis.call('INCR', KEYS[2])
+redis.call('DEL', KEYS[1])
+redis.call('PUBLISH', ARGV[1], KEYS[1])
+return 1
+"""
+)
+
+
+def _cache_key(user_id: str) -> str:
+    return f"{USER_CACHE_PREFIX}{user_id}"
+
+
+def _version_key(user_id: str) -> str:
+    return f"{USER_VERSION_PREFIX}{user_id}"
+
+
+def to_public(user: User) -> UserPublic:
+    return UserPublic(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        tz=user.tz,
+        locale=user.locale,
+        emailVerified=user.email_verified,
+    )
+
+
+async def is_active(db: AsyncSession, user_id: str) -> bool:
+    """Whether the user exists and is not deleted, read in the caller's transaction on the primary."""
+    result = await db.execute(
+        select(User.id).where(User.id == user_id, User.deleted_at.is_(None)), bind_arguments=PRIMARY
+    )
+    return result.first() is not None
+
+
+async def _read_profile(db: AsyncSession, user_id: str) -> UserPublic | None:
+    # From the primary: a lagging replica could miss a fresh sign-up, or still
+    # hold the row an invalidation just replaced and put it back in the cache.
+    async with db.begin():
+        result = await db.execute(select(User).where(User.id == user_id), bind_arguments=PRIMARY)
+        user = result.scalar_one_or_none()
+    return to_public(user) if user is not None and user.deleted_at is None else None
+
+
+async def _load_profile(db: AsyncSession, redis_conn: redis.Redis, user_id: str) -> UserPublic | None:
+    key = _cache_key(user_id)
+    version, cached = await redis_conn.mget(_version_key(user_id), key)
+    if cached is not None:
+        USER_CACHE.labels("hit").inc()
+        return UserPublic.model_validate_json(cached)
+    USER_CACHE.labels("miss").inc()
+
+    profile = await _read_profile(db, user_id)
+    if profile is None:
+        return None
+    await _FILL(
+        redis_conn,
+        [key, _version_key(user_id)],
+        [version or "0", profile.model_dump_json(), settings.user_cache_ttl_s],
+    )
+    return profile
+
+
+async def get_profile(db: AsyncSession, redis_conn: redis.Redis, user_id: str) -> UserPublic | None:
+    """Return the public profile from worker memory, then Redis, then MySQL.
+
+    Deleted users resolve to ``None`` and are not cached.
+    """
+    if settings.user_cache_ttl_s <= 0:
+        return await _read_profile(db, user_id)
+    return await local_cache.get(
+        _cache_key(user_id),
+        lambda: _load_profile(db, redis_conn, user_id),
+        cache_if=lambda profile: profile is not None,
+    )
+
+
+async def invalidate_profile(redis_conn: redis.Redis, user_id: str) -> None:
+    """Call after any change to a user's profile fields, password or ``deleted_at``."""
+    await _INVALIDATE(redis_conn, [_cache_key(user_id), _version_key(user_id)], [INVALIDATION_CHANNEL])
@@ -0,0 +1,70 @@
+import time
+from typing import Callable
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    After ``failure_threshold`` failures in a row the breaker opens and rejects
+    calls for ``reset_timeout_s``. Then it lets a single trial call through;
+    its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout_s: float,
+        on_state_change: Callable[[str], None] | None = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._on_state_change = on_state_change
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            if self._on_state_change is not None:
+                self._on_state_change(state)
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.OPEN:
+            raise CircuitOpen()
+        if state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpen()
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._trial_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def release(self) -> None:
+        """Forget a call that ended without an outcome, e.g. cancelled; frees the half-open trial slot."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
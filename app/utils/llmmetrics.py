@@ -0,0 +1,47 @@
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core.metrics import LLM_CALL_SECONDS, LLM_TOKENS
+
+_CALL_OK = LLM_CALL_SECONDS.labels("ok")
+_CALL_ERROR = LLM_CALL_SECONDS.labels("error")
+_PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+_COMPLETION_TOKENS = LLM_TOKENS.labels("completion")
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Records chat model latency and token usage for every call the model makes.
+
+    Attach it to the model itself so invoke, stream and batch calls are all
+    covered. Streamed calls carry no usage block, so only their latency is seen.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._started: dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: dict, prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            _CALL_OK.observe(time.perf_counter() - started)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens"):
+            _PROMPT_TOKENS.inc(usage["prompt_tokens"])
+        if usage.get("completion_tokens"):
+            _COMPLETION_TOKENS.inc(usage["completion_tokens"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            _CALL_ERROR.observe(time.perf_counter() - started)
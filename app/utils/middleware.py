@@ -1,41 +1,202 @@
-from typing import Iterable
+import asyncio
+import hmac
+import logging
+import random
+import time
+import uuid
+from typing import Any, Iterable
 
-from fastapi import HTTPException, Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi import status
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_SECONDS
+from app.utils.profiling import RequestProfile, verify_profile_token
+
+logger = logging.getLogger(__name__)
 
 STATE_CHANGING_METHODS: set[str] = {"POST", "PUT", "PATCH", "DELETE"}
 _LOCALHOST_HOSTNAMES: set[str] = {"localhost", "127.0.0.1"}
 
 
-class EnforceHTTPSMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if not settings.enforce_https:
-            return await call_next(request)
-        proto = request.headers.get("x-forwarded-proto", request.url.scheme)
-        hostname = request.url.hostname
-        allow_http_local = hostname in _LOCALHOST_HOSTNAMES
-        if proto != "https" and not allow_http_local:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="HTTPS required")
-        response = await call_next(request)
-        if proto == "https":
-            response.headers["Strict-Transport-Security"] = f"max-age={settings.hsts_max_age}; includeSubDomains"
-        return response
-
-
-class CSRFMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, *, exempt_paths: Iterable[str] | None = None):
-        super().__init__(app)
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _hostname(scope: Scope) -> str | None:
+    host = _header(scope, b"host")
+    if host is None:
+        server = scope.get("server")
+        return server[0] if server else None
+    if host.startswith("["):
+        return host[1 : host.find("]")]
+    return host.rsplit(":", 1)[0] if ":" in host else host
+
+
+class EnforceHTTPSMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.enforce_https:
+            await self.app(scope, receive, send)
+            return
+
+        proto = _header(scope, b"x-forwarded-proto") or scope["scheme"]
+        if proto != "https" and _hostname(scope) not in _LOCALHOST_HOSTNAMES:
+            response = JSONResponse({"detail": "HTTPS required"}, status_code=status.HTTP_400_BAD_REQUEST)
+            await response(scope, receive, send)
+            return
+        if proto != "https":
+            await self.app(scope, receive, send)
+            return
+
+        hsts = f"max-age={settings.hsts_max_age}; includeSubDomains"
+
+        async def send_with_hsts(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["Strict-Transport-Security"] = hsts
+            await send(message)
+
+        await self.app(scope, receive, send_with_hsts)
+
+
+class CSRFMiddleware:
+    def __init__(self, app: ASGIApp, *, exempt_paths: Iterable[str] | None = None) -> None:
+        self.app = app
         self.exempt_paths = set(exempt_paths or [])
+        self.header_name = settings.csrf_header_name.lower().encode("latin-1")
+        self.cookie_name = settings.csrf_cookie_name
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["method"] in STATE_CHANGING_METHODS
+            and scope["path"] not in self.exempt_paths
+        ):
+            header_token = _header(scope, self.header_name)
+            cookie_header = _header(scope, b"cookie")
+            cookie_token = cookie_parser(cookie_header).get(self.cookie_name) if cookie_header else None
+            if (
+                not header_token
+                or not cookie_token
+                or not hmac.compare_digest(header_token.encode(), cookie_token.encode())
+            ):
+                response = JSONResponse({"detail": "CSRF failed"}, status_code=status.HTTP_403_FORBIDDEN)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+UNMATCHED_ROUTE = "unmatched"
+_STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+
+class MetricsMiddleware:
+    """Observes request latency per route template, method and status class.
+
+    Label children for every route are created at lifespan startup, so the
+    request path only does a dict lookup.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._children: dict[tuple[str, str, str], Any] = {}
+
+    def _child(self, method: str, route: str, status_class: str):
+        key = (method, route, status_class)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = HTTP_REQUEST_SECONDS.labels(method, route, status_class)
+        return child
+
+    def _preregister(self, routes: Iterable[BaseRoute]) -> None:
+        for route in routes:
+            for method in getattr(route, "methods", None) or ():
+                for status_class in _STATUS_CLASSES:
+                    self._child(method, route.path, status_class)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            if scope["type"] == "lifespan" and "app" in scope:
+                self._preregister(scope["app"].routes)
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self._child(
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                _STATUS_CLASSES[min(max(status_code // 100, 1), 5) - 1],
+            ).observe(time.perf_counter() - started)
+
+
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class ProfilingMiddleware:
+    """Profiles sampled requests, or ones carrying a signed ``X-Profile-Token``.
+
+    The dump is tagged with the route template and request id, and the
+    request id is echoed in the response so the file can be found.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    def _wanted(self, scope: Scope) -> bool:
+        options = settings.profiling
+        if options.sample_rate and random.random() < options.sample_rate:
+            return True
+        if not options.header_enabled:
+            return False
+        token = _header(scope, PROFILE_TOKEN_HEADER)
+        return token is not None and verify_profile_token(token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile.begin(settings.profiling.mode)
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _header(scope, REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-Id"] = request_id
+            await send(message)
 
-    async def dispatch(self, request: Request, call_next):
-        if request.method in STATE_CHANGING_METHODS and request.url.path not in self.exempt_paths:
-            header_name = settings.csrf_header_name
-            cookie_name = settings.csrf_cookie_name
-            header_token = request.headers.get(header_name)
-            cookie_token = request.cookies.get(cookie_name)
-            if not header_token or not cookie_token or header_token != cookie_token:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="CSRF failed")
-        return await call_next(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            profile.end()
+            route = scope.get("route")
+            path = await asyncio.to_thread(
+                profile.dump, route.path if route is not None else UNMATCHED_ROUTE, request_id, elapsed
+            )
+            logger.info("Profiled %s %s in %.1f ms: %s", scope["method"], scope["path"], elapsed * 1000, path)
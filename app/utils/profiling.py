@@ -0,0 +1,201 @@
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MODE_SAMPLE = "sample"
+MODE_CPROFILE = "cprofile"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def sign_profile_token(expires_at: int) -> str:
+    """Token for the profiling header, valid until the unix time ``expires_at``."""
+    digest = hmac.new(settings.jwt_secret.encode(), f"profile:{expires_at}".encode(), hashlib.sha256)
+    return f"{expires_at}.{digest.hexdigest()}"
+
+
+def verify_profile_token(token: str) -> bool:
+    expires_at, _, _ = token.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(token.encode(), sign_profile_token(int(expires_at)).encode())
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Samples one thread's stack on a timer thread and counts collapsed stacks.
+
+    Everything the sampled thread runs is seen, so on the event loop thread a
+    profile also includes other requests that were interleaved with this one.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float) -> None:
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """Profiles the calling thread between ``start`` and ``stop`` and dumps the result to a file."""
+
+    # cProfile is process-wide and the sampler sees the whole loop, so one profile runs at a time.
+    _busy = threading.Lock()
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self._profiler: cProfile.Profile | None = None
+        self._sampler: StackSampler | None = None
+
+    @classmethod
+    def begin(cls, mode: str) -> "RequestProfile | None":
+        if not cls._busy.acquire(blocking=False):
+            return None
+        profile = cls(mode)
+        if mode == MODE_CPROFILE:
+            profile._profiler = cProfile.Profile()
+            profile._profiler.enable()
+        else:
+            interval_s = settings.profiling.sample_interval_ms / 1000
+            profile._sampler = StackSampler(threading.get_ident(), interval_s)
+            profile._sampler.start()
+        return profile
+
+    def end(self) -> None:
+        try:
+            if self._profiler is not None:
+                self._profiler.disable()
+            if self._sampler is not None:
+                self._sampler.stop()
+        finally:
+            RequestProfile._busy.release()
+
+    def dump(self, route: str, request_id: str, elapsed_s: float) -> str:
+        """Write the profile to ``profiling.output_dir``; blocking, run it off the loop."""
+        os.makedirs(settings.profiling.output_dir, exist_ok=True)
+        name = "-".join(
+            [
+                time.strftime("%Y%m%dT%H%M%S"),
+                _UNSAFE.sub("_", route.strip("/")) or "root",
+                _UNSAFE.sub("_", request_id),
+                f"{elapsed_s * 1000:.0f}ms",
+            ]
+        )
+        if self._profiler is not None:
+            path = os.path.join(settings.profiling.output_dir, f"{name}.prof")
+            self._profiler.dump_stats(path)
+        else:
+            path = os.path.join(settings.profiling.output_dir, f"{name}.collapsed")
+            with open(path, "w") as f:
+                f.write(self._sampler.collapsed())
+        return path
+
+
+class LoopLagMonitor:
+    """Reports callbacks that block the event loop for longer than ``threshold_s``.
+
+    A task on the loop records a heartbeat every ``interval_s``; a watchdog
+    thread logs the loop thread's stack when the heartbeat stalls, which
+    points at the blocking call while it is still running.
+    """
+
+    def __init__(self, interval_s: float, threshold_s: float) -> None:
+        self.interval_s = interval_s
+        self.threshold_s = threshold_s
+        self._beat = time.monotonic()
+        self._loop_thread = 0
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    async def run(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        try:
+            while True:
+                self._beat = expected = time.monotonic() + self.interval_s
+                await asyncio.sleep(self.interval_s)
+                EVENT_LOOP_LAG_SECONDS.observe(max(time.monotonic() - expected, 0.0))
+        finally:
+            self._stop.set()
+            self._watchdog.join()
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stop.wait(self.threshold_s / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold_s or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            logger.warning("Event loop blocked for %.0f ms, currently at:\n%s", stalled * 1000, stack)
+
+
+_monitor_task: asyncio.Task | None = None
+
+
+def start_loop_monitor() -> None:
+    global _monitor_task
+    if settings.profiling.loop_lag_threshold_ms > 0 and _monitor_task is None:
+        monitor = LoopLagMonitor(
+            interval_s=settings.profiling.loop_lag_interval_ms / 1000,
+            threshold_s=settings.profiling.loop_lag_threshold_ms / 1000,
+        )
+        _monitor_task = asyncio.create_task(monitor.run())
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor_task
+    if _monitor_task is None:
+        return
+    _monitor_task.cancel()
+    try:
+        await _monitor_task
+    except asyncio.CancelledError:
+        pass
+    _monitor_task = None
@@ -0,0 +1,83 @@
+"""Import-time budget for ``import main``, measured with ``python -X importtime``.
+
+Fails (exit 1) when the best of ``--runs`` fresh interpreters takes longer
+than ``--budget-ms`` to import ``main``, when importing it pulls in one of the
+lazily loaded heavy packages, or when it opens a database engine.
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget-ms 1200 --runs 5 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from benchmarks.asgi import BENCH_ENV
+
+# Loaded on first use only; importing main must not reach them.
+LAZY_PACKAGES = {"langchain", "langchain_core", "langchain_openai", "openai", "tiktoken", "fastapi_mail"}
+
+PROBE = "import main\nfrom app.core import db\nassert db._engine is None, 'importing main created the engine'\n"
+
+
+def measure() -> tuple[dict[str, int], str | None]:
+    """Import ``main`` in a fresh interpreter; returns cumulative microseconds per module and any error."""
+    env = {**BENCH_ENV, **os.environ}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    cumulative: dict[str, int] = {}
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        _, _, rest = line.partition(":")
+        _, total_us, name = (part.strip() for part in rest.split("|"))
+        if total_us.isdigit():
+            cumulative[name] = int(total_us)
+    return cumulative, "\n".join(errors) if proc.returncode else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail when importing main gets slower or heavier")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3, help="best of this many cold imports")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level packages to list")
+    args = parser.parse_args()
+
+    best: dict[str, int] | None = None
+    for _ in range(args.runs):
+        cumulative, error = measure()
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        if best is None or cumulative["main"] < best["main"]:
+            best = cumulative
+
+    failures = []
+    main_ms = best["main"] / 1000
+    if main_ms > args.budget_ms:
+        failures.append(f"import main took {main_ms:.0f} ms, budget {args.budget_ms:.0f} ms")
+    loaded = sorted({name.split(".")[0] for name in best} & LAZY_PACKAGES)
+    if loaded:
+        failures.append(f"import main loaded lazy packages: {', '.join(loaded)}")
+
+    top_level = sorted(
+        ((us, name) for name, us in best.items() if "." not in name and name != "main"), reverse=True
+    )
+    print(f"import main: {main_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for us, name in top_level[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
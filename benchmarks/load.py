@@ -0,0 +1,332 @@
+"""Scripted load scenarios for the auth and motivation hot paths, fully in-process.
+
+Builds ``main.create_app()`` against the stand-ins in ``benchmarks.standins``
+(SQLite via aiosqlite, fakeredis, a fake chat model, a no-op mailer) and
+drives it through ``benchmarks.asgi``. Argon2 runs for real on the password
+pool. Each scenario reports throughput, p50/p95/p99 latency and DB statements
+and Redis round trips per request (from the app's own Prometheus metrics) as JSON.
+
+    pip install -r requirements-bench.txt
+    python -m benchmarks.load                                   # all scenarios, JSON to stdout
+    python -m benchmarks.load --users 100 --scenario signin_mix
+    python -m benchmarks.load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --baseline benchmarks/baseline.json --threshold 0.25
+
+With ``--baseline`` the exit status is 1 when any scenario's p95 or
+throughput is worse than the baseline by more than ``--threshold``, or when
+it needs more DB statements or Redis round trips per request.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from typing import Awaitable, Callable
+
+from benchmarks import standins
+
+standins.configure()
+
+from app.core.config import settings  # noqa: E402
+from app.core.metrics import DB_QUERY_SECONDS, REDIS_COMMAND_SECONDS  # noqa: E402
+from app.core.redis import RedisClient  # noqa: E402
+from app.services import motivation as motivation_service  # noqa: E402
+from app.services.quotes import hour_index_for  # noqa: E402
+from benchmarks.asgi import call, scope  # noqa: E402
+
+PASSWORD = "correct-horse-battery"
+WRONG_PASSWORD = "wrong-horse-battery"
+
+
+def _count(histogram) -> float:
+    return sum(
+        sample.value
+        for metric in histogram.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_count")
+    )
+
+
+def _ip(i: int) -> bytes:
+    # Distinct client addresses so the per-IP rate limits measure their cost without rejecting the load.
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}".encode()
+
+
+@dataclass
+class Client:
+    """Cookie jar for one simulated browser."""
+
+    ip: bytes
+    cookies: dict[str, str] = field(default_factory=dict)
+    csrf: str | None = None
+
+    def headers(self, *extra: tuple[bytes, bytes]) -> list[tuple[bytes, bytes]]:
+        headers = [(b"x-forwarded-for", self.ip), *extra]
+        if self.cookies:
+            headers.append((b"cookie", "; ".join(f"{k}={v}" for k, v in self.cookies.items()).encode()))
+        if self.csrf:
+            headers.append((settings.csrf_header_name.encode(), self.csrf.encode()))
+        return headers
+
+    def absorb(self, response_headers: list[tuple[bytes, bytes]]) -> None:
+        for key, value in response_headers:
+            if key == b"set-cookie":
+                cookie = SimpleCookie(value.decode())
+                for name, morsel in cookie.items():
+                    self.cookies[name] = morsel.value
+            elif key == settings.csrf_header_name.encode():
+                self.csrf = value.decode()
+
+
+class Recorder:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+
+    async def request(
+        self,
+        app,
+        client: Client,
+        method: str,
+        path: str,
+        payload: dict | None = None,
+        expect: tuple[int, ...] = (200,),
+    ) -> tuple[int, bytes]:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        extra = [(b"content-type", b"application/json")] if payload is not None else []
+        request_scope = scope(method, path.split("?")[0], client.headers(*extra))
+        request_scope["query_string"] = path.partition("?")[2].encode()
+        started = time.perf_counter()
+        status_code, headers, response = await call(app, request_scope, body)
+        self.latencies.append(time.perf_counter() - started)
+        if status_code not in expect:
+            self.errors[str(status_code)] = self.errors.get(str(status_code), 0) + 1
+        client.absorb(headers)
+        return status_code, response
+
+
+async def _gather_limited(concurrency: int, jobs: list[Callable[[], Awaitable[None]]]) -> None:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with gate:
+            await job()
+
+    await asyncio.gather(*map(run, jobs))
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def _measure(name: str, scenario: Callable[[Recorder], Awaitable[None]]) -> dict:
+    recorder = Recorder(name)
+    await asyncio.sleep(settings.audit.flush_ms / 1000)  # let earlier background writes land
+    queries, commands = _count(DB_QUERY_SECONDS), _count(REDIS_COMMAND_SECONDS)
+    started = time.perf_counter()
+    await scenario(recorder)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(settings.audit.flush_ms / 1000)  # include the audit batches this load caused
+    requests = len(recorder.latencies)
+    return {
+        "requests": requests,
+        "errors": recorder.errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(recorder.latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(recorder.latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(recorder.latencies, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(recorder.latencies) * 1000, 2),
+        "db_queries_per_request": round((_count(DB_QUERY_SECONDS) - queries) / requests, 2),
+        "redis_commands_per_request": round((_count(REDIS_COMMAND_SECONDS) - commands) / requests, 2),
+    }
+
+
+class Suite:
+    def __init__(self, app, users: int, concurrency: int, rotations: int, bad_ratio: float) -> None:
+        self.app = app
+        self.users = users
+        self.concurrency = concurrency
+        self.rotations = rotations
+        self.bad_ratio = bad_ratio
+        self.emails = [f"bench-{i}@example.com" for i in range(users)]
+        self._next_ip = 0
+
+    def client(self) -> Client:
+        self._next_ip += 1
+        return Client(ip=_ip(self._next_ip))
+
+    async def signup_storm(self, rec: Recorder) -> None:
+        """Every user signs up at once."""
+
+        def job(email):
+            payload = {"email": email, "password": PASSWORD, "name": email.split("@")[0]}
+            return lambda: rec.request(self.app, self.client(), "POST", "/auth/signup", payload)
+
+        await _gather_limited(self.concurrency, [job(email) for email in self.emails])
+
+    async def signin_mix(self, rec: Recorder) -> None:
+        """Two sign-ins per user, ``bad_ratio`` of them with a wrong password."""
+        rng = random.Random(7)
+        jobs = []
+        for email in self.emails * 2:
+            bad = rng.random() < self.bad_ratio
+            payload = {"email": email, "password": WRONG_PASSWORD if bad else PASSWORD}
+            expect = (401,) if bad else (200,)
+            jobs.append(
+                lambda payload=payload, expect=expect: rec.request(
+                    self.app, self.client(), "POST", "/auth/signin", payload, expect
+                )
+            )
+        await _gather_limited(self.concurrency, jobs)
+
+    async def refresh_rotation(self, rec: Recorder) -> None:
+        """``concurrency`` signed-in users each rotate their refresh token ``rotations`` times in a row."""
+        clients = []
+        setup = Recorder("setup")
+        for email in self.emails[: self.concurrency]:
+            client = self.client()
+            await setup.request(self.app, client, "POST", "/auth/signin", {"email": email, "password": PASSWORD})
+            clients.append(client)
+
+        async def rotate(client: Client) -> None:
+            for _ in range(self.rotations):
+                await rec.request(self.app, client, "POST", "/auth/refresh")
+
+        await asyncio.gather(*map(rotate, clients))
+
+    async def _motivation_burst(self, rec: Recorder) -> None:
+        jobs = [
+            lambda i=i: rec.request(self.app, self.client(), "GET", f"/motivation/now?name=User{i % 50}")
+            for i in range(self.users)
+        ]
+        await _gather_limited(self.concurrency, jobs)
+
+    async def motivation_steady(self, rec: Recorder) -> None:
+        """Mid-hour: templates and per-name messages are already cached."""
+        await self._motivation_burst(rec)
+
+    async def motivation_boundary(self, rec: Recorder) -> None:
+        """First requests of a new hour when pre-generation did not run: every cache is empty."""
+        redis_conn = RedisClient.get_client()
+        keys = [key async for key in redis_conn.scan_iter("motivation:*")]
+        if keys:
+            await redis_conn.delete(*keys)
+        await self._motivation_burst(rec)
+
+    async def motivation_boundary_pregenerated(self, rec: Recorder) -> None:
+        """First requests of a new hour after pre-generation: templates exist, per-name messages do not."""
+        redis_conn = RedisClient.get_client()
+        keys = [key async for key in redis_conn.scan_iter("motivation:*")]
+        if keys:
+            await redis_conn.delete(*keys)
+        await motivation_service.pregenerate_hour(hour_index_for(datetime.now(timezone.utc)), redis_conn=redis_conn)
+        await self._motivation_burst(rec)
+
+
+SCENARIOS = [
+    "signup_storm",
+    "signin_mix",
+    "refresh_rotation",
+    "motivation_boundary",
+    "motivation_boundary_pregenerated",
+    "motivation_steady",
+]
+# Later scenarios sign in as the users the storm created.
+REQUIRES_USERS = {"signin_mix", "refresh_rotation"}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    standins.install(llm_latency_s=args.llm_latency_ms / 1000)
+    await standins.seed_quotes()
+
+    from main import create_app
+
+    app = create_app()
+    suite = Suite(app, args.users, args.concurrency, args.rotations, args.bad_ratio)
+    selected = args.scenario or SCENARIOS
+    if REQUIRES_USERS & set(selected) and "signup_storm" not in selected:
+        selected = ["signup_storm", *selected]
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        for name in SCENARIOS:
+            if name in selected:
+                results[name] = await _measure(name, getattr(suite, name))
+                print(f"{name}: {results[name]['throughput_rps']} req/s", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "rotations": args.rotations,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return a line per metric that regressed past ``threshold`` relative to ``baseline``."""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        for metric in ("db_queries_per_request", "redis_commands_per_request"):
+            # Round trips barely depend on the machine, so any real increase counts.
+            if current[metric] > base[metric] + 0.05:
+                regressions.append(f"{name}: {metric} {base[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="In-process load scenarios for the auth and motivation paths")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable; default is all")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rotations", type=int, default=20, help="refreshes per user in refresh_rotation")
+    parser.add_argument("--bad-ratio", type=float, default=0.2, help="share of sign-ins with a wrong password")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="latency of the fake chat model")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative p95/throughput regression")
+    parser.add_argument("--save-baseline", help="also write the report here as the new baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
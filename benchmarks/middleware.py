@@ -0,0 +1,111 @@
+"""Requests/sec through the HTTPS + CSRF middleware stack, before and after the pure-ASGI rewrite.
+
+Drives the ASGI app in-process (no sockets, no server) so the numbers isolate
+middleware overhead. ``/auth/refresh`` is a stub that carries the same cookie
+and CSRF header a browser sends, so the CSRF check runs on every request.
+
+    python -m benchmarks.middleware --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.asgi import BENCH_ENV, call, scope
+
+for _key, _value in BENCH_ENV.items():
+    os.environ.setdefault(_key, _value)
+
+from fastapi import FastAPI, HTTPException, Request, status  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.utils.middleware import (  # noqa: E402
+    _LOCALHOST_HOSTNAMES,
+    STATE_CHANGING_METHODS,
+    CSRFMiddleware,
+    EnforceHTTPSMiddleware,
+)
+
+
+class LegacyEnforceHTTPSMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if not settings.enforce_https:
+            return await call_next(request)
+        proto = request.headers.get("x-forwarded-proto", request.url.scheme)
+        if proto != "https" and request.url.hostname not in _LOCALHOST_HOSTNAMES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="HTTPS required")
+        response = await call_next(request)
+        if proto == "https":
+            response.headers["Strict-Transport-Security"] = f"max-age={settings.hsts_max_age}; includeSubDomains"
+        return response
+
+
+class LegacyCSRFMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, *, exempt_paths=None):
+        super().__init__(app)
+        self.exempt_paths = set(exempt_paths or [])
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method in STATE_CHANGING_METHODS and request.url.path not in self.exempt_paths:
+            header_token = request.headers.get(settings.csrf_header_name)
+            cookie_token = request.cookies.get(settings.csrf_cookie_name)
+            if not header_token or not cookie_token or header_token != cookie_token:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="CSRF failed")
+        return await call_next(request)
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    https, csrf = (LegacyEnforceHTTPSMiddleware, LegacyCSRFMiddleware) if legacy else (
+        EnforceHTTPSMiddleware,
+        CSRFMiddleware,
+    )
+    app.add_middleware(https)
+    app.add_middleware(csrf, exempt_paths={"/auth/signin"})
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/auth/refresh")
+    async def refresh():
+        return {"data": None}
+
+    return app
+
+
+def _scope(method: str, path: str) -> dict:
+    headers = [(b"user-agent", b"bench")]
+    if method == "POST":
+        headers += [
+            (b"cookie", f"refresh_token=abc; {settings.csrf_cookie_name}=tok123".encode()),
+            (settings.csrf_header_name.encode(), b"tok123"),
+            (b"content-length", b"0"),
+        ]
+    return scope(method, path, headers)
+
+
+async def _call(app, request_scope: dict) -> int:
+    status_code, _, _ = await call(app, request_scope)
+    return status_code
+
+
+async def run(requests: int) -> None:
+    for method, path in (("GET", "/health"), ("POST", "/auth/refresh")):
+        scope = _scope(method, path)
+        for label, legacy in (("before (BaseHTTPMiddleware)", True), ("after (pure ASGI)", False)):
+            app = build_app(legacy)
+            assert await _call(app, scope) == 200
+            started = time.perf_counter()
+            for _ in range(requests):
+                await _call(app, scope)
+            elapsed = time.perf_counter() - started
+            print(f"{method:4} {path:14} {label:28} {requests / elapsed:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(run(parser.parse_args().requests))
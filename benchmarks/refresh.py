@@ -0,0 +1,106 @@
+"""Latency and DB round trips of ``POST /auth/refresh`` against real MySQL and Redis.
+
+Seeds one throwaway user and session, then rotates the refresh token
+``--requests`` times through the full app (middleware included), feeding each
+response's cookie into the next request. Uses DATABASE_URL / REDIS_URL from
+the environment or ``.env``; the user is deleted afterwards.
+
+    python -m benchmarks.refresh --requests 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from http.cookies import SimpleCookie
+
+from sqlalchemy import delete, event
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, dispose_engine, get_engine
+from app.models.audit import AuthAudit
+from app.models.types import uuid7_str
+from app.models.user import User
+from app.services import session as session_service
+from app.services.tokens import issue_refresh
+from benchmarks.asgi import call, scope
+from main import app
+
+round_trips = 0
+
+
+@event.listens_for(get_engine().sync_engine, "before_cursor_execute")
+def _count_statement(*args) -> None:
+    global round_trips
+    round_trips += 1
+
+
+@event.listens_for(get_engine().sync_engine, "commit")
+def _count_commit(*args) -> None:
+    global round_trips
+    round_trips += 1
+
+
+async def _seed() -> tuple[str, str]:
+    user = User(email=f"bench-{uuid.uuid4().hex}@example.com", password_hash="x", name="Bench")
+    family_id = uuid7_str()
+    async with AsyncSessionLocal() as db, db.begin():
+        db.add(user)
+        await db.flush()
+        refresh, jti, idx, _ = issue_refresh(user.id, family_id, 0)
+        await session_service.create_session(
+            db,
+            user_id=user.id,
+            family_id=family_id,
+            jti=jti,
+            idx=idx,
+            refresh_ttl_days=settings.refresh_token_days,
+            user_agent="bench",
+            ip="127.0.0.1",
+        )
+    return user.id, refresh
+
+
+async def run(requests: int) -> None:
+    global round_trips
+    user_id, refresh = await _seed()
+    latencies: list[float] = []
+    trips: list[int] = []
+    try:
+        for _ in range(requests):
+            headers = [
+                (b"cookie", f"refresh_token={refresh}; {settings.csrf_cookie_name}=bench".encode()),
+                (settings.csrf_header_name.encode(), b"bench"),
+                (b"user-agent", b"bench"),
+            ]
+            round_trips = 0
+            started = time.perf_counter()
+            status_code, response_headers, body = await call(app, scope("POST", "/auth/refresh", headers))
+            latencies.append((time.perf_counter() - started) * 1000)
+            trips.append(round_trips)
+            if status_code != 200:
+                raise SystemExit(f"refresh failed with {status_code}: {body[:200]!r}")
+            cookies = SimpleCookie()
+            for name, value in response_headers:
+                if name == b"set-cookie":
+                    cookies.load(value.decode())
+            refresh = cookies["refresh_token"].value
+    finally:
+        async with AsyncSessionLocal() as db, db.begin():
+            await db.execute(delete(AuthAudit).where(AuthAudit.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+        await dispose_engine()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"requests            {requests}")
+    print(f"p50 latency         {statistics.median(latencies):8.2f} ms")
+    print(f"p99 latency         {p99:8.2f} ms")
+    print(f"DB round trips/req  {statistics.mean(trips):8.2f} (statements + commits)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(run(parser.parse_args().requests))
@@ -0,0 +1,88 @@
+"""Local stand-ins so the whole app runs in one process with no external services.
+
+``configure`` must run before anything under ``app`` is imported: settings
+are read at import time, and the engine is built from them on first use.
+``install`` then swaps the Redis client for fakeredis, the chat model for a
+fixed-latency fake and the mailer for a no-op, and seeds the quotes the
+motivation routes need.
+
+Needs the packages in ``requirements-bench.txt``.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from benchmarks.asgi import BENCH_ENV
+
+FAKE_MESSAGE = "Keep going, {name}. One focused hour at a time adds up."
+QUOTES = [
+    ("The secret of getting ahead is getting started.", "Mark Twain", "en"),
+    ("Well begun is half done.", "Aristotle", "en"),
+    ("천 리 길도 한 걸음부터.", None, "ko-KR"),
+]
+
+
+def configure(workdir: str | None = None) -> str:
+    """Point DATABASE_URL at a fresh SQLite file and disable background work the scenarios don't cover."""
+    workdir = workdir or tempfile.mkdtemp(prefix="bench-")
+    os.environ.update(BENCH_ENV)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}?timeout=30"
+    os.environ["REDIS_URL"] = "redis://fakeredis"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    return workdir
+
+
+def install(llm_latency_s: float) -> None:
+    import fakeredis
+    from langchain_core.language_models import FakeListChatModel
+    from sqlalchemy import event
+
+    from app.core.config import settings
+    from app.core.db import get_engine
+    from app.core.redis import InstrumentedRedis, RedisClient
+    from app.services import email as email_service
+    from app.services import motivation as motivation_service
+    from app.utils.llmmetrics import LLMMetricsHandler
+
+    class LatencyChatModel(FakeListChatModel):
+        latency_s: float = 0.0
+
+        async def _agenerate(self, *args, **kwargs):
+            await asyncio.sleep(self.latency_s)
+            return await super()._agenerate(*args, **kwargs)
+
+    @event.listens_for(get_engine().sync_engine, "connect")
+    def _sqlite_wal(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    async def null_send_mail(subject: str, recipients: list[str], body: str) -> None:
+        return None
+
+    fake = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    RedisClient._client = InstrumentedRedis(connection_pool=fake.connection_pool, decode_responses=True)
+
+    motivation_service.set_model(
+        LatencyChatModel(responses=[FAKE_MESSAGE], latency_s=llm_latency_s, callbacks=[LLMMetricsHandler()])
+    )
+    email_service.send_mail = null_send_mail
+    settings.mail_outbox.enabled = False
+    settings.retention.enabled = False
+
+
+async def seed_quotes() -> None:
+    """Create the schema (the app no longer does at startup) and the quotes to pick from."""
+    from app.core.db import Base, get_engine
+    from app.models import audit, password_reset, session, user  # noqa: F401
+    from app.models.quote import Quote
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        rows = [
+            {"id": i, "text": text, "author": author, "locale": locale}
+            for i, (text, author, locale) in enumerate(QUOTES, 1)
+        ]
+        await conn.execute(Quote.__table__.insert(), rows)
@@ -0,0 +1,77 @@
+"""Insert throughput and index size: CHAR(36) uuid4 keys vs BINARY(16) UUIDv7 keys.
+
+Creates two scratch tables shaped like ``sessions`` (primary key, unique jti,
+indexed user_id) in the database from DATABASE_URL, fills each with the same
+number of rows in multi-row batches, then reports rows/sec and the InnoDB
+data and index sizes. The scratch tables are dropped afterwards.
+
+    python -m benchmarks.uuid_keys --rows 200000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models.types import uuid7
+
+VARIANTS = {
+    "char36_uuid4": ("CHAR(36)", lambda: str(uuid.uuid4())),
+    "binary16_uuid7": ("BINARY(16)", lambda: uuid7().bytes),
+}
+
+
+async def run(rows: int, batch: int) -> None:
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    users = [uuid.uuid4() for _ in range(1000)]
+    async with engine.connect() as conn:
+        for name, (col_type, new_id) in VARIANTS.items():
+            table = f"bench_keys_{name}"
+            await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {table} (id {col_type} NOT NULL PRIMARY KEY, user_id {col_type} NOT NULL, "
+                    f"jti {col_type} NOT NULL UNIQUE, created_at DATETIME NOT NULL, INDEX (user_id))"
+                )
+            )
+            as_key = (lambda u: u.bytes) if col_type.startswith("BINARY") else str
+            stmt = text(f"INSERT INTO {table} (id, user_id, jti, created_at) VALUES (:id, :user_id, :jti, NOW())")
+            started = time.perf_counter()
+            for offset in range(0, rows, batch):
+                params = [
+                    {"id": new_id(), "user_id": as_key(users[i % len(users)]), "jti": new_id()}
+                    for i in range(offset, min(offset + batch, rows))
+                ]
+                await conn.execute(stmt, params)
+                await conn.commit()
+            elapsed = time.perf_counter() - started
+
+            await conn.execute(text(f"ANALYZE TABLE {table}"))
+            data, index = (
+                await conn.execute(
+                    text(
+                        "SELECT DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+                    ),
+                    {"table": table},
+                )
+            ).one()
+            print(
+                f"{name:16} {rows / elapsed:10.0f} rows/s   data {data / 2**20:8.1f} MiB   "
+                f"secondary indexes {index / 2**20:8.1f} MiB"
+            )
+            await conn.execute(text(f"DROP TABLE {table}"))
+            await conn.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.batch))
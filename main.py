@@ -1,11 +1,38 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import signal
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from app.api.routes import admin as admin_routes
 from app.api.routes import auth as auth_routes
 from app.api.routes import motivation as motivation_routes
 from app.core.config import settings
-from app.core.db import Base, engine
-from app.utils.middleware import CSRFMiddleware, EnforceHTTPSMiddleware
+from app.core.db import (
+    AsyncSessionLocal,
+    Base,
+    check_replicas,
+    dispose_engine,
+    get_engine,
+    start_replica_monitor,
+    stop_replica_monitor,
+    warm_engine,
+)
+from app.core.redis import RedisClient, load_scripts, local_cache
+from app.services import audit as audit_service
+from app.services import email as email_service
+from app.services import motivation as motivation_service
+from app.services import password as password_service
+from app.services import retention as retention_service
+from app.services.quotes import quote_index
+from app.utils import profiling
+from app.utils.middleware import CSRFMiddleware, EnforceHTTPSMiddleware, MetricsMiddleware, ProfilingMiddleware
+
+logger = logging.getLogger(__name__)
 
 EXEMPT_CSRF_PATHS = {
     "/auth/signin",
@@ -13,11 +40,115 @@ EXEMPT_CSRF_PATHS = {
     "/auth/otp/start",
     "/auth/otp/verify",
     "/auth/password/reset",
+    # Authenticated by the admin token header, not cookies.
+    "/admin/users/bulk",
 }
 
 
+def _drain_on_sigterm(app: FastAPI):
+    """Chain onto the server's SIGTERM handler: fail /ready first, then let the server stop.
+
+    Returns the previous handler so it can be restored, or None when there is
+    no server handler to chain onto (e.g. not on the main thread).
+    """
+    try:
+        previous = signal.getsignal(signal.SIGTERM)
+    except ValueError:
+        return None
+    if not callable(previous):
+        return None
+    loop = asyncio.get_running_loop()
+    delay = settings.lifespan.drain_delay_s
+
+    def handle_sigterm(signum, frame):
+        app.state.draining = True
+        logger.info("SIGTERM received; draining for %.1fs before shutdown", delay)
+        if delay > 0:
+            loop.call_soon_threadsafe(loop.call_later, delay, previous, signum, frame)
+        else:
+            previous(signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    except ValueError:
+        return None
+    return previous
+
+
+async def _warmup() -> None:
+    options = settings.lifespan
+    jobs = [RedisClient.warm(options.warm_redis_connections), load_scripts(RedisClient.get_client())]
+    if options.warm_db_connections > 0:
+        jobs.append(warm_engine(options.warm_db_connections))
+    if options.warm_password_pool:
+        jobs.append(password_service.warm_pool())
+    tasks = [asyncio.ensure_future(job) for job in jobs]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Don't leave the other warmups running into the shutdown that follows.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    await check_replicas()
+    async with AsyncSessionLocal() as db:
+        await quote_index.load(db)
+
+
+async def _drain() -> None:
+    """Stop background work and flush what is queued; pools are closed by the caller."""
+    await stop_replica_monitor()
+    await motivation_service.stop_scheduler()
+    await retention_service.stop_sweeper()
+    await audit_service.writer.stop()
+    await email_service.stop_dispatchers()
+    await local_cache.stop()
+    await asyncio.to_thread(password_service.shutdown_pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup runs inside the try too: if warmup fails, whatever it already
+    # opened (loop monitor, pools, Argon2 workers) is still shut down.
+    previous_sigterm = None
+    try:
+        profiling.start_loop_monitor()
+        if settings.db_create_all:
+            async with get_engine().begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        await _warmup()
+        start_replica_monitor()
+        local_cache.start(RedisClient.get_client())
+        motivation_service.start_scheduler()
+        if settings.audit.async_writes:
+            audit_service.writer.start()
+        email_service.start_dispatchers()
+        retention_service.start_sweeper()
+        previous_sigterm = _drain_on_sigterm(app)
+        app.state.ready = True
+        yield
+    finally:
+        app.state.ready = False
+        app.state.draining = True
+        if previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, previous_sigterm)
+        try:
+            await asyncio.wait_for(_drain(), settings.lifespan.shutdown_timeout_s)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Shutdown did not finish within %ss; closing pools anyway", settings.lifespan.shutdown_timeout_s
+            )
+        finally:
+            await dispose_engine()
+            await RedisClient.close()
+            await profiling.stop_loop_monitor()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.api_title, version=settings.api_version)
+    app = FastAPI(title=settings.api_title, version=settings.api_version, lifespan=lifespan)
+    app.state.ready = False
+    app.state.draining = False
 
     app.add_middleware(EnforceHTTPSMiddleware)
     app.add_middleware(
@@ -36,13 +167,21 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    app.add_middleware(ProfilingMiddleware)
+    # Outermost, so requests rejected by the other middleware are timed too.
+    app.add_middleware(MetricsMiddleware)
+
     app.include_router(auth_routes.router)
     app.include_router(motivation_routes.router)
+    app.include_router(admin_routes.router)
 
-    @app.on_event("startup")
-    async def on_startup():
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+    @app.exception_handler(password_service.PasswordPoolSaturated)
+    async def password_pool_saturated(request: Request, exc: password_service.PasswordPoolSaturated):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Server busy"},
+            headers={"Retry-After": str(settings.password_hash.retry_after_s)},
+        )
 
     @app.get("/", tags=["misc"])
     async def root():
@@ -50,8 +189,24 @@ def create_app() -> FastAPI:
 
     @app.get("/health", tags=["misc"])
     async def health():
+        """Liveness: the process is up and serving."""
         return {"status": "ok"}
 
+    @app.get("/ready", tags=["misc"])
+    async def ready(request: Request):
+        """Readiness: warmed up and not draining."""
+        state = request.app.state
+        if state.ready and not state.draining:
+            return {"status": "ready"}
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "draining" if state.draining else "starting"},
+        )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     return app
 
 
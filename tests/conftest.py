@@ -0,0 +1,18 @@
+import os
+
+# Settings are read when app modules are imported; tests never reach the services these point at.
+TEST_ENV = {
+    "DATABASE_URL": "sqlite+aiosqlite://",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "JWT_SECRET": "test",
+    "JWT_ISS": "test",
+    "COOKIE_DOMAIN": "example.com",
+    "MAIL_SENDER": "test@example.com",
+    "MAIL_HOST": "localhost",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "OPENAI_API_KEY": "sk-test",
+}
+
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.db import Base
+from app.models.audit import AuthAudit
+from app.services import audit
+
+
+@pytest.fixture
+def sessionmaker(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'audit.db'}")
+
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(audit, "AsyncSessionLocal", maker)
+    yield maker
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    fresh = audit.AuditWriter()
+    monkeypatch.setattr(audit, "writer", fresh)
+    return fresh
+
+
+async def _record(db: AsyncSession, event: str) -> None:
+    await audit.record_event(db, user_id=None, event=event, ip="127.0.0.1", user_agent="pytest")
+
+
+async def _events(sessionmaker) -> list[str]:
+    async with sessionmaker() as db:
+        return sorted((await db.scalars(select(AuthAudit.event))).all())
+
+
+def test_only_committed_rows_are_written(sessionmaker, writer):
+    class Abort(Exception):
+        pass
+
+    async def run():
+        writer.start()
+        async with sessionmaker() as db:
+            async with db.begin():
+                await _record(db, "signin")
+            with pytest.raises(Abort):
+                async with db.begin():
+                    await _record(db, "signout")
+                    raise Abort
+        await writer.stop()
+        return await _events(sessionmaker)
+
+    assert asyncio.run(run()) == ["signin"]
+
+
+def test_rows_wait_for_the_commit(sessionmaker, writer, monkeypatch):
+    monkeypatch.setattr(settings.audit, "flush_ms", 1)
+
+    async def run():
+        writer.start()
+        async with sessionmaker() as db, db.begin():
+            await _record(db, "signin")
+            await asyncio.sleep(0.05)
+            # Nothing has reached the batcher while the request's transaction is open.
+            assert await _events(sessionmaker) == []
+        await writer.stop()
+        return await _events(sessionmaker)
+
+    assert asyncio.run(run()) == ["signin"]
+
+
+def test_sync_backpressure_writes_in_the_callers_transaction(sessionmaker, writer, monkeypatch):
+    monkeypatch.setattr(settings.audit, "max_queue", 1)
+    monkeypatch.setattr(settings.audit, "backpressure", audit.BACKPRESSURE_SYNC)
+
+    async def run():
+        writer.start()
+        async with sessionmaker() as db:
+            async with db.begin():
+                await _record(db, "queued")
+                await _record(db, "inline")
+                inline = (await db.scalars(select(AuthAudit.event))).all()
+        await writer.stop()
+        return inline, await _events(sessionmaker)
+
+    inline, written = asyncio.run(run())
+
+    assert inline == ["inline"]
+    assert written == ["inline", "queued"]
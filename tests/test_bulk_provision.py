@@ -0,0 +1,137 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.routes import admin
+from app.core.config import settings
+from app.core.db import Base, get_db
+from app.models import audit, password_reset, session, user  # noqa: F401
+from app.models.user import User
+from app.services import provisioning
+
+ADMIN_TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def sessionmaker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'provision.db'}")
+
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def app(sessionmaker, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", ADMIN_TOKEN)
+    app = FastAPI()
+    app.include_router(admin.router)
+
+    async def test_db():
+        async with sessionmaker() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = test_db
+    return app
+
+
+async def post_chunked(app, path: str, query: str, chunks: list[bytes]) -> tuple[int, bytes]:
+    """POST ``chunks`` as separate ``http.request`` messages, the way a server delivers a large upload."""
+    pending = list(chunks)
+    response_done = asyncio.Event()
+    status_code = 0
+    body: list[bytes] = []
+
+    async def receive():
+        if pending:
+            await asyncio.sleep(0)
+            chunk = pending.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [
+            (b"host", b"api.example.com"),
+            (b"content-type", b"application/x-ndjson"),
+            (b"x-admin-token", ADMIN_TOKEN.encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("api.example.com", 443),
+    }
+    await app(scope, receive, send)
+    return status_code, b"".join(body)
+
+
+def test_bulk_endpoint_answers_every_line_of_a_chunked_upload(app, sessionmaker):
+    rows = [json.dumps({"email": f"user{i}@example.com", "name": f"User {i}"}) + "\n" for i in range(300)]
+    payload = "".join(rows).encode()
+    # 30 chunks that do not line up with row boundaries.
+    size = len(payload) // 30 + 1
+    chunks = [payload[i : i + size] for i in range(0, len(payload), size)]
+    assert len(chunks) == 30
+
+    async def count_users():
+        async with sessionmaker() as db:
+            return await db.scalar(select(func.count()).select_from(User))
+
+    status_code, body = asyncio.run(
+        asyncio.wait_for(post_chunked(app, "/admin/users/bulk", "chunk_size=50", chunks), timeout=30)
+    )
+
+    assert status_code == 200
+    results = [json.loads(line) for line in body.decode().splitlines()]
+    assert [result["line"] for result in results] == list(range(1, 301))
+    assert {result["status"] for result in results} == {"created"}
+    assert asyncio.run(count_users()) == 300
+
+
+def test_rejected_chunk_reports_errors_and_later_chunks_still_run(sessionmaker, monkeypatch):
+    ids = iter([str(uuid.uuid4())] * 2)
+    # The first chunk's two users share a primary key; every later id is fresh.
+    monkeypatch.setattr(provisioning, "uuid7_str", lambda: next(ids, None) or str(uuid.uuid4()))
+
+    async def parsed():
+        for i in range(4):
+            yield i + 1, {"email": f"user{i}@example.com"}, None
+
+    async def run():
+        async with sessionmaker() as db:
+            return [result async for result in provisioning.provision(db, parsed(), chunk_size=2)]
+
+    results = asyncio.run(run())
+
+    assert [(result.line, result.status) for result in results] == [
+        (1, "error"),
+        (2, "error"),
+        (3, "created"),
+        (4, "created"),
+    ]
+    assert all(result.error for result in results[:2])
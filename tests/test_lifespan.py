@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import main
+from app.core.config import settings
+from app.core.redis import RedisClient
+from app.services import password as password_service
+from app.utils import profiling
+
+
+def test_failed_warmup_releases_what_startup_opened(monkeypatch):
+    monkeypatch.setattr(settings.lifespan, "warm_db_connections", 0)
+    monkeypatch.setattr(settings.lifespan, "warm_password_pool", True)
+    closed = []
+
+    async def no_scripts(client):
+        return None
+
+    async def redis_down(connections):
+        await asyncio.sleep(0.05)
+        raise ConnectionError("redis unreachable")
+
+    async def close():
+        closed.append("redis")
+
+    async def dispose():
+        closed.append("db")
+
+    monkeypatch.setattr(RedisClient, "warm", redis_down)
+    monkeypatch.setattr(main, "load_scripts", no_scripts)
+    monkeypatch.setattr(RedisClient, "close", close)
+    monkeypatch.setattr(main, "dispose_engine", dispose)
+    app = main.create_app()
+
+    async def start():
+        async with app.router.lifespan_context(app):
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(start())
+
+    assert profiling._monitor_task is None
+    assert password_service._pool is None
+    assert closed == ["db", "redis"]
+    assert app.state.ready is False
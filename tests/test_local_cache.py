@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.core.redis import TrackedCache
+
+
+class FakeConnection:
+    def __init__(self, fail_on: str | None) -> None:
+        self.fail_on = fail_on
+        self.connected = False
+        self.last_command = None
+
+    async def connect(self) -> None:
+        if self.fail_on == "connect":
+            raise OSError("connection refused")
+        self.connected = True
+
+    async def send_command(self, *args) -> None:
+        self.last_command = args[0]
+
+    async def read_response(self):
+        if self.last_command == self.fail_on:
+            raise ConnectionError(f"{self.fail_on} failed")
+        return 7
+
+    async def disconnect(self) -> None:
+        self.connected = False
+
+
+@pytest.mark.parametrize("fail_on", ["connect", "CLIENT", "SUBSCRIBE"])
+def test_failed_subscribe_disconnects_both_connections(fail_on):
+    made: list[FakeConnection] = []
+
+    def make_connection():
+        made.append(FakeConnection(fail_on))
+        return made[-1]
+
+    client = SimpleNamespace(connection_pool=SimpleNamespace(make_connection=make_connection))
+    cache = TrackedCache(maxsize=10, ttl_s=60)
+
+    with pytest.raises((ConnectionError, OSError)):
+        asyncio.run(cache._subscribe(client))
+
+    assert len(made) == 2
+    assert not any(conn.connected for conn in made)
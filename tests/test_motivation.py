@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from app.core.config import settings
+from app.services import motivation
+from app.services.motivation import (
+    CACHE_LOCK_PREFIX,
+    FALLBACK_MESSAGE,
+    MotivationChunk,
+    _cache_key,
+    motivation_for_quote,
+    pregenerate_hour,
+    stream_motivation_for_quote,
+)
+from app.services.quotes import IndexedQuote, QuoteIndex, hour_index_for
+from app.utils.circuitbreaker import CircuitBreaker
+
+QUOTE = IndexedQuote(1, "Well begun is half done.", "Aristotle", "en")
+NOW = datetime(2026, 10, 17, 9, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+@pytest.fixture
+def chat_model(monkeypatch):
+    monkeypatch.setattr(motivation, "_model", None)
+    model = FakeListChatModel(responses=["first", "second"])
+    motivation.set_model(model)
+    return model
+
+
+def test_stuck_lock_serves_the_fallback_without_calling_the_model(redis_conn, chat_model, monkeypatch):
+    monkeypatch.setattr(settings.motivation, "lock_timeout_s", 1)
+    monkeypatch.setattr(settings.motivation, "budget_s", 5.0)
+    lock_key = CACHE_LOCK_PREFIX + _cache_key(hour_index_for(NOW), None, QUOTE.id, "Ada")
+
+    async def run():
+        # Another worker took the lock and never writes a result or lets go.
+        await redis_conn.set(lock_key, "someone-else", px=60000)
+        return await motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)
+
+    assert asyncio.run(run()) == FALLBACK_MESSAGE
+    assert chat_model.i == 0
+
+
+class FailingChatModel(FakeListChatModel):
+    def _call(self, *args, **kwargs) -> str:
+        raise ConnectionError("model unreachable")
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    fresh = CircuitBreaker(failure_threshold=2, reset_timeout_s=60)
+    monkeypatch.setattr(motivation, "breaker", fresh)
+    return fresh
+
+
+def test_generated_message_is_cached_for_the_hour(redis_conn, chat_model, breaker):
+    async def run():
+        first = await motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)
+        again = await motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)
+        return first, again
+
+    assert asyncio.run(run()) == ("first", "first")
+    assert chat_model.i == 1
+
+
+def test_slow_stream_falls_back_within_the_budget(redis_conn, breaker, monkeypatch):
+    monkeypatch.setattr(motivation, "_model", None)
+    motivation.set_model(FakeListChatModel(responses=["late"], sleep=1.0))
+    monkeypatch.setattr(settings.motivation, "budget_s", 0.1)
+
+    async def run():
+        stream = stream_motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)
+        return [item async for item in stream]
+
+    assert asyncio.run(run()) == [MotivationChunk(FALLBACK_MESSAGE, cached=False, fallback=True)]
+    assert breaker._failures == 1
+
+
+def test_stream_tells_cached_messages_from_fallbacks(redis_conn, chat_model, breaker):
+    async def run():
+        fresh = [chunk async for chunk in stream_motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)]
+        again = [chunk async for chunk in stream_motivation_for_quote(QUOTE, "Ada", now=NOW, redis_conn=redis_conn)]
+        missing = [chunk async for chunk in stream_motivation_for_quote(None, "Ada", now=NOW, redis_conn=redis_conn)]
+        return fresh, again, missing
+
+    fresh, again, missing = asyncio.run(run())
+
+    assert "".join(chunk.text for chunk in fresh) == "first"
+    assert not any(chunk.cached or chunk.fallback for chunk in fresh)
+    assert again == [MotivationChunk("first", cached=True, fallback=False)]
+    assert missing == [MotivationChunk(FALLBACK_MESSAGE, cached=False, fallback=True)]
+
+
+def test_failed_calls_fall_back_and_open_the_breaker(redis_conn, breaker, monkeypatch):
+    monkeypatch.setattr(motivation, "_model", None)
+    motivation.set_model(FailingChatModel(responses=["unused"]))
+
+    async def run():
+        return [await motivation_for_quote(QUOTE, f"User {i}", now=NOW, redis_conn=redis_conn) for i in range(3)]
+
+    assert asyncio.run(run()) == [FALLBACK_MESSAGE] * 3
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def _index(*quotes: IndexedQuote) -> QuoteIndex:
+    index = QuoteIndex()
+    index._merge(quotes)
+    return index
+
+
+def test_pregeneration_failures_count_against_the_breaker(redis_conn, breaker, monkeypatch):
+    monkeypatch.setattr(motivation, "_model", None)
+    motivation.set_model(FailingChatModel(responses=["unused"]))
+    monkeypatch.setattr(motivation, "quote_index", _index(QUOTE, IndexedQuote(2, "Festina lente.", None, "la")))
+    hour_index = hour_index_for(NOW)
+
+    async def run():
+        return [await pregenerate_hour(hour_index, redis_conn=redis_conn) for _ in range(2)]
+
+    assert asyncio.run(run()) == [0, 0]
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_pregeneration_writes_one_template_per_locale(redis_conn, chat_model, breaker, monkeypatch):
+    monkeypatch.setattr(motivation, "quote_index", _index(QUOTE, IndexedQuote(2, "Festina lente.", None, "la")))
+
+    written = asyncio.run(pregenerate_hour(hour_index_for(NOW), redis_conn=redis_conn))
+
+    assert written == 3
+    assert breaker.state == CircuitBreaker.CLOSED
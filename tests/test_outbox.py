@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services import email as email_service
+from app.services.email import OUTBOX_DEAD_KEY, OUTBOX_KEY, OutboxDispatcher
+
+
+class FakeSMTP:
+    is_connected = True
+
+    def __init__(self, fail_subjects: set[str]) -> None:
+        self.fail_subjects = fail_subjects
+        self.sent: list[str] = []
+
+    async def send_message(self, message) -> None:
+        if message["Subject"] in self.fail_subjects:
+            raise OSError("relay hiccup")
+        self.sent.append(message["Subject"])
+
+
+def _item(subject: str) -> str:
+    return json.dumps(
+        {
+            "id": subject,
+            "subject": subject,
+            "recipients": ["user@example.com"],
+            "body": "<p>hi</p>",
+            "attempts": 0,
+            "queued_at": time.time(),
+        }
+    )
+
+
+async def _wait_for(condition, timeout_s: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def redis_conn():
+    return fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+def test_dispatcher_survives_redis_errors_and_bad_payloads(redis_conn, monkeypatch):
+    monkeypatch.setattr(settings.mail_outbox, "poll_s", 1)
+    smtp = FakeSMTP(fail_subjects={"retry-me"})
+    dispatcher = OutboxDispatcher(redis_conn)
+
+    async def connection():
+        return smtp
+
+    async def zadd_down(*args, **kwargs):
+        raise RedisError("retry set unavailable")
+
+    monkeypatch.setattr(dispatcher, "_connection", connection)
+    monkeypatch.setattr(redis_conn, "zadd", zadd_down)
+
+    llen = redis_conn.llen
+    llen_calls = 0
+
+    async def flaky_llen(key):
+        nonlocal llen_calls
+        llen_calls += 1
+        if llen_calls == 2:
+            raise RedisError("connection reset")
+        return await llen(key)
+
+    monkeypatch.setattr(redis_conn, "llen", flaky_llen)
+
+    async def scenario():
+        # Dispatchers take from the tail, so these are sent in push order.
+        await redis_conn.lpush(OUTBOX_KEY, "{not json", json.dumps({"id": "x"}), _item("retry-me"), _item("first"))
+        task = asyncio.create_task(dispatcher.run())
+        try:
+            await _wait_for(lambda: smtp.sent == ["first"])
+            await _wait_for(lambda: llen_calls >= 3)
+            await redis_conn.lpush(OUTBOX_KEY, _item("second"))
+            await _wait_for(lambda: smtp.sent == ["first", "second"])
+            assert not task.done()
+            assert await redis_conn.lrange(OUTBOX_DEAD_KEY, 0, -1) == [json.dumps({"id": "x"}), "{not json"]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_failed_send_is_scheduled_for_retry(redis_conn, monkeypatch):
+    smtp = FakeSMTP(fail_subjects={"retry-me"})
+    dispatcher = OutboxDispatcher(redis_conn)
+
+    async def connection():
+        return smtp
+
+    monkeypatch.setattr(dispatcher, "_connection", connection)
+
+    async def scenario():
+        await dispatcher._send_batch([_item("retry-me"), _item("ok")])
+        retries = await redis_conn.zrange(email_service.OUTBOX_RETRY_KEY, 0, -1)
+        assert [json.loads(raw)["attempts"] for raw in retries] == [1]
+        assert smtp.sent == ["ok"]
+
+    asyncio.run(scenario())
+
+
+def test_mail_left_by_a_dead_dispatcher_is_sent_again(redis_conn, monkeypatch):
+    smtp = FakeSMTP(fail_subjects=set())
+    dispatcher = OutboxDispatcher(redis_conn)
+
+    async def connection():
+        return smtp
+
+    monkeypatch.setattr(dispatcher, "_connection", connection)
+
+    async def scenario():
+        # "dead" crashed mid-batch and its heartbeat expired; "busy" is still sending.
+        await redis_conn.sadd(email_service.OUTBOX_WORKERS_KEY, "dead", "busy")
+        await redis_conn.lpush(f"{email_service.OUTBOX_PROCESSING_PREFIX}dead", _item("older"), _item("newer"))
+        await redis_conn.lpush(f"{email_service.OUTBOX_PROCESSING_PREFIX}busy", _item("in-flight"))
+        await redis_conn.set(f"{email_service.OUTBOX_ALIVE_PREFIX}busy", "1", ex=60)
+        task = asyncio.create_task(dispatcher.run())
+        try:
+            await _wait_for(lambda: len(smtp.sent) == 2)
+            assert smtp.sent == ["older", "newer"]
+            assert await redis_conn.smembers(email_service.OUTBOX_WORKERS_KEY) == {"busy", dispatcher._worker_id}
+            assert await redis_conn.llen(f"{email_service.OUTBOX_PROCESSING_PREFIX}busy") == 1
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_stopping_mid_send_returns_the_batch_to_the_outbox(redis_conn, monkeypatch):
+    sending = asyncio.Event()
+
+    class StuckSMTP(FakeSMTP):
+        async def send_message(self, message) -> None:
+            sending.set()
+            await asyncio.Event().wait()
+
+    dispatcher = OutboxDispatcher(redis_conn)
+
+    async def connection():
+        return StuckSMTP(fail_subjects=set())
+
+    monkeypatch.setattr(dispatcher, "_connection", connection)
+
+    async def scenario():
+        await redis_conn.lpush(OUTBOX_KEY, _item("first"), _item("second"))
+        task = asyncio.create_task(dispatcher.run())
+        await asyncio.wait_for(sending.wait(), 5)
+        assert await redis_conn.llen(OUTBOX_KEY) == 0
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        queued = [json.loads(raw)["subject"] for raw in await redis_conn.lrange(OUTBOX_KEY, 0, -1)]
+        assert queued == ["second", "first"]
+        assert await redis_conn.llen(dispatcher._processing_key) == 0
+
+    asyncio.run(scenario())
+
+
+def test_malformed_entries_are_capped_and_expire(redis_conn, monkeypatch):
+    monkeypatch.setattr(settings.mail_outbox, "dead_max", 2)
+    dispatcher = OutboxDispatcher(redis_conn)
+
+    async def scenario():
+        await dispatcher._send_batch(["{one", "{two", "{three"])
+        assert await redis_conn.lrange(OUTBOX_DEAD_KEY, 0, -1) == ["{three", "{two"]
+        assert 0 < await redis_conn.ttl(OUTBOX_DEAD_KEY) <= settings.mail_outbox.dead_ttl_s
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+import asyncio
+
+import fakeredis
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.db import Base
+from app.models.quote import Quote
+from app.services.quotes import QuoteIndex
+
+
+@pytest.fixture
+def sessionmaker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'quotes.db'}")
+
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def test_refresh_picks_up_late_commits_and_releases_the_connection(sessionmaker, monkeypatch):
+    monkeypatch.setattr("app.services.quotes.settings.quote_index_refresh_s", 0)
+    redis_conn = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    index = QuoteIndex()
+
+    async def add(*quotes: Quote) -> None:
+        async with sessionmaker() as db, db.begin():
+            db.add_all(quotes)
+
+    async def run():
+        await add(Quote(id=1, text="one", locale="en"), Quote(id=3, text="three", locale="en"))
+        async with sessionmaker() as db:
+            await index.ensure_fresh(db, redis_conn)
+            # Id 2 was allocated before 3 but its transaction committed after the index saw 3.
+            await add(Quote(id=2, text="two", locale="en"), Quote(id=4, text="four", locale="de"))
+            await index.ensure_fresh(db, redis_conn)
+            assert not db.in_transaction()
+            await index.ensure_fresh(db, redis_conn)
+
+    asyncio.run(run())
+
+    assert [index.pick(hour).id for hour in range(4)] == [1, 2, 3, 4]
+    assert [index.pick(hour, "en").text for hour in range(3)] == ["one", "two", "three"]
+    assert index.pick(0, "de").text == "four"
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core import db
+from app.core.config import settings
+from app.models import audit, password_reset, session, user  # noqa: F401
+from app.models.user import User
+from app.services import users as user_service
+
+
+class FakeConnection:
+    dialect = SimpleNamespace(name="mysql")
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+
+    async def execute(self, statement):
+        response = self.responses[str(statement)]
+        if isinstance(response, Exception):
+            raise response
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(first=lambda: response))
+
+
+def _lag(responses: dict) -> float:
+    return asyncio.run(db._replication_lag(FakeConnection(responses)))
+
+
+def test_lag_falls_back_to_slave_status_on_older_servers():
+    responses = {
+        "SHOW REPLICA STATUS": ProgrammingError("SHOW REPLICA STATUS", {}, Exception("1064 syntax error")),
+        "SHOW SLAVE STATUS": {"Seconds_Behind_Master": 3},
+    }
+    assert _lag(responses) == 3.0
+
+
+def test_lag_accepts_mariadb_replica_status_columns():
+    assert _lag({"SHOW REPLICA STATUS": {"Seconds_Behind_Master": 0}}) == 0.0
+
+
+def test_non_replica_server_is_rejected():
+    with pytest.raises(RuntimeError, match="not a replica"):
+        _lag({"SHOW REPLICA STATUS": None})
+
+
+def test_missing_privilege_is_reported():
+    denied = OperationalError("SHOW", {}, Exception("1227 Access denied; you need REPLICATION CLIENT"))
+    with pytest.raises(RuntimeError, match="REPLICATION CLIENT"):
+        _lag({"SHOW REPLICA STATUS": denied, "SHOW SLAVE STATUS": denied})
+
+
+def test_first_failed_check_is_logged_as_error(tmp_path, monkeypatch, caplog):
+    replica = db.Replica("replica-test", f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+
+    async def not_a_replica(conn):
+        raise RuntimeError("the server is not a replica")
+
+    monkeypatch.setattr(db, "_replication_lag", not_a_replica)
+
+    async def check_twice():
+        await db._check_replica(replica)
+        await db._check_replica(replica)
+        await replica.engine.dispose()
+
+    with caplog.at_level(logging.WARNING, logger="app.core.db"):
+        asyncio.run(check_twice())
+
+    assert replica.healthy is False
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path, monkeypatch):
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = db.Replica("replica-test", f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    replica.healthy = True
+
+    async def create_schema():
+        for engine in (primary, replica.engine):
+            async with engine.begin() as conn:
+                await conn.run_sync(db.Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    monkeypatch.setattr(db, "get_engine", lambda: primary)
+    monkeypatch.setattr(db, "get_replicas", lambda: [replica])
+    yield async_sessionmaker(primary, class_=AsyncSession, sync_session_class=db.RoutingSession, expire_on_commit=False)
+
+    async def dispose():
+        await primary.dispose()
+        await replica.engine.dispose()
+
+    asyncio.run(dispose())
+
+
+def test_uncached_profile_reads_the_primary(primary_and_replica, monkeypatch):
+    monkeypatch.setattr(settings, "user_cache_ttl_s", 0)
+    sessionmaker = primary_and_replica
+
+    async def scenario():
+        async with sessionmaker() as session:
+            async with session.begin():
+                # Only the primary has the new user, as while the replica lags.
+                new_user = User(email="new@example.com", password_hash="x", name="New")
+                session.add(new_user)
+        async with sessionmaker() as session:
+            async with session.begin():
+                routed = (await session.execute(select(User).where(User.id == new_user.id))).scalar_one_or_none()
+            profile = await user_service.get_profile(session, None, new_user.id)
+        return routed, profile
+
+    routed, profile = asyncio.run(scenario())
+
+    assert routed is None
+    assert profile is not None and profile.email == "new@example.com"